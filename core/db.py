@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import contextlib
+import queue
 import sqlite3
+import threading
 from pathlib import Path
 from typing import Iterable, Sequence
 
@@ -9,6 +11,13 @@ import pandas as pd
 
 DB_PATH = Path("eplp.db")
 
+# Per-connection settings (journal_mode=WAL is persistent and set in ensure_base_schema)
+_CONN_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",   # safe with WAL; fsync at checkpoints instead of every commit
+    "PRAGMA cache_size=-65536",    # 64 MiB page cache
+    "PRAGMA temp_store=MEMORY",
+)
+
 
 # ------------------------------ Connection ------------------------------
 
@@ -18,16 +27,86 @@ def get_conn():
     conn = sqlite3.connect(DB_PATH, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
     try:
         conn.row_factory = sqlite3.Row
+        for pragma in _CONN_PRAGMAS:
+            conn.execute(pragma)
         yield conn
         conn.commit()
     finally:
         conn.close()
 
 
+@contextlib.contextmanager
+def transaction():
+    """
+    Yield a connection inside one explicit write transaction: BEGIN IMMEDIATE
+    takes the write lock up front, COMMIT on success, ROLLBACK on error.
+    """
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+# Read-only connections reused by read_df; writes keep going through get_conn()
+_READ_POOL_SIZE = 4
+_READ_PRAGMAS = (
+    "PRAGMA query_only=1",
+    "PRAGMA cache_size=-20000",    # ~20 MiB page cache per reader
+    "PRAGMA temp_store=MEMORY",
+)
+_read_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=_READ_POOL_SIZE)
+
+def _open_reader() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH.resolve().as_uri() + "?mode=ro", uri=True,
+                           check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+    conn.row_factory = sqlite3.Row
+    for pragma in _READ_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@contextlib.contextmanager
+def read_conn():
+    """
+    Borrow a pooled read-only connection (mode=ro, query_only). With WAL, readers
+    run alongside the writer; each SELECT sees the latest committed data.
+    """
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        conn = _open_reader()
+    try:
+        yield conn
+    except BaseException:
+        conn.close()
+        raise
+    try:
+        _read_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+_version_conn: sqlite3.Connection | None = None
+_version_lock = threading.Lock()
+
+def data_version() -> int:
+    """
+    PRAGMA data_version as seen by one long-lived, read-only-use connection.
+    The value changes whenever any other connection commits, so it can key caches.
+    """
+    global _version_conn
+    with _version_lock:
+        if _version_conn is None:
+            _version_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        return int(_version_conn.execute("PRAGMA data_version").fetchone()[0])
+
+
 # ------------------------------ Helpers ---------------------------------
 
 def read_df(sql: str, params: Sequence | None = None) -> pd.DataFrame:
-    with get_conn() as conn:
+    with read_conn() as conn:
         return pd.read_sql_query(sql, conn, params=params or ())
 
 def exec_one(sql: str, params: Sequence | None = None) -> None:
@@ -47,6 +126,12 @@ def exec_sql(sql: str, params: Sequence | None = None) -> None:
     """Back-compat alias for simple statements that don't need results."""
     exec_one(sql, params or ())
 
+def exec_sql_returning_id(sql: str, params: Sequence | None = None) -> int:
+    """Run an INSERT and return the new row's id (cursor.lastrowid on the same connection)."""
+    with get_conn() as conn:
+        cur = conn.execute(sql, params or ())
+        return int(cur.lastrowid)
+
 def exec_sql_fetchone(sql: str, params: Sequence | None = None):
     """Run a query and return a single row (sqlite3.Row or None)."""
     with get_conn() as conn:
@@ -149,6 +234,12 @@ def ensure_base_schema() -> None:
     with get_conn() as c:
         cur = c.cursor()
 
+        # WAL lets readers proceed during import/clone writes; the mode sticks to the DB file
+        try:
+            cur.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError:
+            pass
+
         # degrees
         cur.execute("""
         CREATE TABLE IF NOT EXISTS degrees(
@@ -496,6 +587,19 @@ def run_light_migrations() -> None:
         except sqlite3.OperationalError:
             pass
 
+        # case-insensitive lookup keys used by the catalog import / duplicate scan
+        for ddl in (
+            "CREATE INDEX IF NOT EXISTS idx_degrees_lname ON degrees(LOWER(name))",
+            "CREATE INDEX IF NOT EXISTS idx_subjects_code_lc ON subjects(degree_id, semester, LOWER(COALESCE(code,'')))",
+            "CREATE INDEX IF NOT EXISTS idx_subjects_deg_sem_lname ON subjects(degree_id, semester, LOWER(name))",
+            "CREATE INDEX IF NOT EXISTS idx_sc_catalog_lname ON subject_criteria(degree_id, semester, LOWER(name)) "
+            "WHERE batch_year IS NULL",
+        ):
+            try:
+                c.execute(ddl)
+            except sqlite3.Error:
+                pass
+
         # theme_settings: add missing columns, then seed id=1 and backfill defaults
         theme_cols = _table_cols(c, "theme_settings")
         for name, decl in [
@@ -3,14 +3,20 @@ from __future__ import annotations
 import os
 import random
 import re
+from functools import lru_cache
 from typing import Optional, Dict, List, Tuple
 
-from .db import get_conn, read_df
+from .db import get_conn, read_df, transaction
 
 # ---------------------------
 # users table (idempotent)
 # ---------------------------
+_SCHEMA_READY = False  # DDL below runs once per process
+
 def _ensure_users_table():
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("""
@@ -28,7 +34,14 @@ def _ensure_users_table():
             cur.execute("CREATE INDEX IF NOT EXISTS idx_users_faculty ON users(faculty_id)")
         except Exception:
             pass
+        try:
+            # case-insensitive username lookups (`username=? COLLATE NOCASE`) seek this index
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users(username COLLATE NOCASE)")
+        except Exception:
+            pass
         conn.commit()
+    _SCHEMA_READY = True
+
 def ensure_users_login_compat():
     """
     Make sure the users table has a plaintext 'password' column (your app authenticates on it),
@@ -60,6 +73,7 @@ def ensure_users_login_compat():
 # ---------------------------
 # Public helpers (kept for app.py)
 # ---------------------------
+@lru_cache(maxsize=4096)
 def sanitize_username(u: str) -> str:
     u = (u or "").strip().lower()
     # keep alnum + dots/underscores only
@@ -71,27 +85,23 @@ def create_user(*, username: str, password: str, role: str = "subject_faculty",
     """Create or update a user. Plaintext password (to match app.py auth)."""
     _ensure_users_table()
     uname = sanitize_username(username)
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("SELECT id FROM users WHERE LOWER(username)=LOWER(?)", (uname,))
-        row = cur.fetchone()
+    # match existing rows case-insensitively (legacy mixed-case usernames exist, and login
+    # compares LOWER(username)); lookup + write share one write lock so they stay atomic
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT id FROM users WHERE username=? COLLATE NOCASE LIMIT 1", (uname,)
+        ).fetchone()
         if row is None:
-            cur.execute(
+            conn.execute(
                 "INSERT INTO users(username, password, role, status, faculty_id, is_active) VALUES(?,?,?,?,?,1)",
                 (uname, password, role, status, faculty_id)
             )
         else:
-            if overwrite_password:
-                cur.execute(
-                    "UPDATE users SET password=?, role=?, status=?, faculty_id=? WHERE id=?",
-                    (password, role, status, faculty_id, row["id"])
-                )
-            else:
-                cur.execute(
-                    "UPDATE users SET role=?, status=?, faculty_id=? WHERE id=?",
-                    (role, status, faculty_id, row["id"])
-                )
-        conn.commit()
+            conn.execute("""
+                UPDATE users SET role=?, status=?, faculty_id=?,
+                    password=CASE WHEN ? THEN ? ELSE password END
+                WHERE id=?
+            """, (role, status, faculty_id, 1 if overwrite_password else 0, password, row[0]))
 
 def _reset_admin_user() -> tuple[bool, str]:
     """Create/Reset default 'admin' with password 'admin' as Superadmin."""
@@ -106,17 +116,20 @@ def _reset_admin_user() -> tuple[bool, str]:
 # Faculty → Users automation
 # ---------------------------
 _TITLES = re.compile(r"^(dr\.?|prof\.?|ar\.?|er\.?|architect|engineer|mr\.?|mrs\.?|ms\.?)\s+", re.I)
+_SPLIT_WS = re.compile(r"\s+")
 
+@lru_cache(maxsize=2048)
 def _split_name(full: str) -> Tuple[str, str]:
     s = str(full or "").strip()
-    s = re.sub(_TITLES, "", s).strip()
-    parts = re.split(r"\s+", s)
+    s = _TITLES.sub("", s).strip()
+    parts = _SPLIT_WS.split(s)
     if not parts:
         return "", ""
     if len(parts) == 1:
         return parts[0].lower(), ""
     return parts[0].lower(), parts[-1].lower()
 
+@lru_cache(maxsize=2048)
 def _base_username(first: str, last: str) -> str:
     if first and last:
         return (first[:5] + last[:1]).lower()
@@ -137,6 +150,15 @@ def _ensure_unique_username(base: str) -> tuple[str, str]:
                 return cand, suffix
     return base + str(random.randint(10000, 99999)), "9999"
 
+def _unique_username_from(base: str, taken: set) -> tuple[str, str]:
+    """Same rule as _ensure_unique_username, checked against an in-memory set of taken names."""
+    for _ in range(2000):
+        suffix = f"{random.randint(1000, 9999)}"
+        cand = sanitize_username(base + suffix)
+        if cand not in taken:
+            return cand, suffix
+    return sanitize_username(base + str(random.randint(10000, 99999))), "9999"
+
 def _temp_password(base: str, suffix: str) -> str:
     return f"{base}@{suffix}"
 
@@ -166,18 +188,33 @@ def ensure_users_for_all_faculty(default_role: str = "subject_faculty") -> List[
     """
     Go through faculty; if any row lacks a linked user, create one.
     Returns list of created credentials.
+    All accounts are inserted in one write transaction with a single executemany.
     """
-    f = read_df("SELECT id, name FROM faculty ORDER BY name")
+    _ensure_users_table()
     created: List[Dict] = []
-    if f.empty:
-        return created
-    linked = read_df("SELECT faculty_id FROM users WHERE faculty_id IS NOT NULL")
-    linked_set = set([int(x) for x in linked["faculty_id"].dropna().tolist()]) if not linked.empty else set()
-    for _, r in f.iterrows():
-        fid = int(r["id"])
-        if fid in linked_set:
-            continue
-        cred = create_user_for_faculty(fid, str(r["name"]), default_role=default_role)
-        if cred:
-            created.append(cred)
+    with transaction() as conn:
+        missing = conn.execute("""
+            SELECT f.id, f.name FROM faculty f
+             WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.faculty_id = f.id)
+             ORDER BY f.name
+        """).fetchall()
+        if not missing:
+            return created
+        taken = {str(r[0]).lower() for r in conn.execute("SELECT username FROM users") if r[0] is not None}
+        rows = []
+        for fid, name in missing:
+            first, last = _split_name(name)
+            base = _base_username(first, last)
+            if not base:
+                continue
+            username, suffix = _unique_username_from(base, taken)
+            taken.add(username)
+            password = _temp_password(base, suffix)
+            rows.append((username, password, default_role, "new", int(fid)))
+            created.append({"username": username, "temp_password": password,
+                            "role": default_role, "faculty_id": int(fid)})
+        conn.executemany(
+            "INSERT INTO users(username, password, role, status, faculty_id, is_active) VALUES(?,?,?,?,?,1)",
+            rows
+        )
     return created
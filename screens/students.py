@@ -1,13 +1,16 @@
 # screens/students.py
 from __future__ import annotations
+import csv
+import datetime
+import io
 import re
+from array import array
 import pandas as pd
 import streamlit as st
 
 from core.db import read_df, get_conn, exec_many, exec_sql
 from core.theme import render_theme_css
 from core.branding import render_header, render_footer
-from core.utils import df_to_csv_bytes
 
 # -------------------------------------------------
 # Permissions
@@ -25,7 +28,12 @@ def _can_edit(role: str) -> bool:
 # -------------------------------------------------
 # Schema guards
 # -------------------------------------------------
+# Tables/indexes only need creating once per process, not on every rerun.
+_SCHEMA_READY = {"degrees": False, "students": False}
+
 def _ensure_degrees_table():
+    if _SCHEMA_READY["degrees"]:
+        return
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("""
@@ -36,8 +44,11 @@ def _ensure_degrees_table():
             )
         """)
         conn.commit()
+    _SCHEMA_READY["degrees"] = True
 
 def _ensure_students_table_and_index():
+    if _SCHEMA_READY["students"]:
+        return
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("""
@@ -58,18 +69,59 @@ def _ensure_students_table_and_index():
         except Exception:
             # If duplicates already exist, index creation will fail; user can run the cleanup button below first.
             pass
+        # Stored lowercase roll for case-insensitive lookups (dupe skipping on import, maintenance CTE),
+        # kept in sync by triggers so every writer (imports, other pages) is covered.
+        try:
+            cur.execute("ALTER TABLE students ADD COLUMN roll_lc TEXT")
+        except Exception:
+            pass  # already present
+        cur.execute("UPDATE students SET roll_lc=LOWER(roll) WHERE roll_lc IS NULL AND roll IS NOT NULL")
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_students_roll_lc_ins AFTER INSERT ON students
+            BEGIN
+                UPDATE students SET roll_lc=LOWER(NEW.roll) WHERE rowid=NEW.rowid;
+            END
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_students_roll_lc_upd AFTER UPDATE OF roll ON students
+            BEGIN
+                UPDATE students SET roll_lc=LOWER(NEW.roll) WHERE rowid=NEW.rowid;
+            END
+        """)
+        try:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_students_degree_rolllc ON students(degree_id, roll_lc)")
+        except Exception:
+            pass
+        # Plain per-degree listings
+        try:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_students_degree_id ON students(degree_id)")
+        except Exception:
+            pass
+        # Listing is ORDER BY roll LIMIT n per degree; keep it index-ordered even if the unique index is missing
+        try:
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_students_degree_roll ON students(degree_id, roll)")
+        except Exception:
+            pass
         conn.commit()
+    _SCHEMA_READY["students"] = True
 
 # -------------------------------------------------
 # Helpers
 # -------------------------------------------------
+_ROLL_RE = re.compile(r"^\s*(\d{4})")  # join year = first 4 digits of roll
+
+def _today_ym() -> tuple[int, int]:
+    # stdlib date is much cheaper than pd.Timestamp.now() on every keystroke rerun
+    d = datetime.date.today()
+    return d.year, d.month
+
 def _batch_from_roll(roll: str, duration_years: int | None) -> str:
     """
     Batch naming:
     - First 4 digits of roll => join year (e.g., 2022)
     - Batch label => 'YYYY-(YYYY+duration)'
     """
-    m = re.match(r"^\s*(\d{4})", str(roll or ""))
+    m = _ROLL_RE.match(str(roll or ""))
     if not m:
         return ""
     start = int(m.group(1))
@@ -81,49 +133,101 @@ def _year_from_roll_first_join(roll: str, duration_years: int | None) -> int | N
     Estimate current academic year (1..duration) from join year.
     Academic year ticks in June (month >= 6 -> +1).
     """
-    m = re.match(r"^\s*(\d{4})", str(roll or ""))
+    m = _ROLL_RE.match(str(roll or ""))
     if not m:
         return None
     join = int(m.group(1))
-    now = pd.Timestamp.now()
-    years_elapsed = (now.year - join) + (1 if now.month >= 6 else 0)
+    now_y, now_m = _today_ym()
+    years_elapsed = (now_y - join) + (1 if now_m >= 6 else 0)
     dur = int(duration_years or 5)
     years_elapsed = max(1, min(dur, years_elapsed if years_elapsed >= 1 else 1))
     return years_elapsed
 
+def _join_years(rolls: pd.Series) -> pd.Series:
+    """Vectorized join year (float, NaN when the roll has no 4-digit prefix)."""
+    return pd.to_numeric(rolls.str.extract(_ROLL_RE, expand=False), errors="coerce")
+
+def _batches_from_join(join_years: pd.Series, durations: pd.Series) -> pd.Series:
+    """Series form of _batch_from_roll; '' where the join year is unknown."""
+    start = join_years.astype("Int64").astype(str)
+    end = (join_years + durations).astype("Int64").astype(str)
+    return (start + "-" + end).where(join_years.notna(), "")
+
+def _years_from_join(join_years: pd.Series, durations: pd.Series) -> pd.Series:
+    """Series form of _year_from_roll_first_join; NaN where the join year is unknown."""
+    now_y, now_m = _today_ym()
+    years_elapsed = (now_y - join_years) + (1 if now_m >= 6 else 0)
+    return years_elapsed.clip(upper=durations).clip(lower=1)
+
 # -------------------------------------------------
 # Import utilities
 # -------------------------------------------------
-ROLL_ALIASES  = {"roll no", "roll", "roll_no", "rollno", "reg no", "reg_no"}
-NAME_ALIASES  = {"student name", "name", "student", "full name", "fullname"}
-EMAIL_ALIASES = {"email", "e-mail", "mail"}
-YEAR_ALIASES  = {"year", "yr"}
-DEG_ALIASES   = {"degree", "program", "course"}
-
-def _pick_col(cols: set[str], candidates: set[str]) -> str | None:
-    for c in candidates:
-        if c in cols:
-            return c
-    return None
+ROLL_ALIASES  = frozenset({"roll no", "roll", "roll_no", "rollno", "rollnumber", "reg no", "reg_no", "registration no"})
+NAME_ALIASES  = frozenset({"student name", "name", "student", "full name", "fullname"})
+EMAIL_ALIASES = frozenset({"email", "e-mail", "mail"})
+YEAR_ALIASES  = frozenset({"year", "yr"})
+DEG_ALIASES   = frozenset({"degree", "program", "course"})
+
+SKIPPED_SHOW_MAX = 100  # rows listed in "Why some rows were skipped?"; the rest are only counted
+
+def _pick_col(cols: frozenset[str], candidates: frozenset[str]) -> str | None:
+    return next(iter(candidates & cols), None)
+
+def _sniff_delimiter(uploaded) -> str:
+    """Guess the CSV delimiter from the first 64 KB (the pyarrow engine can't auto-detect)."""
+    sample = uploaded.read(64 * 1024)
+    uploaded.seek(0)
+    if isinstance(sample, bytes):
+        sample = sample.decode("utf-8-sig", errors="ignore")
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=",;\t|").delimiter
+    except csv.Error:
+        return ","
 
 def _read_students_file(uploaded) -> pd.DataFrame:
     """
     Read CSV or Excel; normalize headers to lowercase; keep cells as strings; strip whitespace.
-    Auto-detect delimiter for CSV.
+    Auto-detect delimiter for CSV. Uses the multithreaded pyarrow CSV engine when available.
     """
     name = (uploaded.name or "").lower()
     if name.endswith((".xlsx", ".xls")):
         df = pd.read_excel(uploaded, dtype=str)
     else:
         try:
-            df = pd.read_csv(uploaded, sep=None, engine="python", dtype=str)
+            df = pd.read_csv(uploaded, sep=_sniff_delimiter(uploaded), engine="pyarrow", dtype=str)
         except Exception:
+            # pyarrow not installed, or a file it can't parse: fall back to the python engine
             uploaded.seek(0)
-            df = pd.read_csv(uploaded, dtype=str)
+            try:
+                df = pd.read_csv(uploaded, sep=None, engine="python", dtype=str)
+            except Exception:
+                uploaded.seek(0)
+                df = pd.read_csv(uploaded, dtype=str)
     df.columns = [str(c).strip().lower() for c in df.columns]
-    df = df.applymap(lambda x: x.strip() if isinstance(x, str) else x)
+    dup_cols = sorted(set(df.columns[df.columns.duplicated()]))
+    if dup_cols:
+        # e.g. "Roll" and "roll": after lowercasing df[c] would be a frame, not a column
+        raise ValueError(f"Duplicate column headers (ignoring case/spaces): {', '.join(dup_cols)}")
+    for c in df.columns:
+        df[c] = df[c].str.strip()
     return df
 
+def _export_students_csv(degree_id: int) -> bytes:
+    """
+    Stream the degree's students from the cursor straight into CSV (no DataFrame copy).
+    Same columns/encoding as the old df_to_csv_bytes export.
+    """
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(["Roll No", "Student Name", "Email", "Batch", "Year"])
+    with get_conn() as conn:
+        w.writerows(conn.execute(
+            "SELECT roll, name, COALESCE(email,''), COALESCE(batch,''), COALESCE(year,'') "
+            "FROM students WHERE degree_id=? ORDER BY roll",
+            (int(degree_id),)
+        ))
+    return buf.getvalue().encode("utf-8-sig")
+
 # -------------------------------------------------
 # Main page
 # -------------------------------------------------
@@ -190,7 +294,7 @@ def render(user: dict):
                 if df_raw.empty:
                     st.error("Could not read any rows from the file.")
                 else:
-                    cols = set(df_raw.columns)
+                    cols = frozenset(df_raw.columns)
                     roll_col = _pick_col(cols, ROLL_ALIASES)
                     name_col = _pick_col(cols, NAME_ALIASES)
                     if not roll_col or not name_col:
@@ -206,61 +310,67 @@ def render(user: dict):
 
                         # degree map (CSV degree can override selection if recognized)
                         all_deg = read_df("SELECT id, name, COALESCE(duration_years,5) AS duration_years FROM degrees")
-                        deg_map = {
-                            str(r["name"]).strip().lower(): (int(r["id"]), int(r["duration_years"]))
-                            for _, r in all_deg.iterrows()
-                        }
+                        deg_keys = all_deg["name"].astype(str).str.strip().str.lower()
+                        id_map  = dict(zip(deg_keys, all_deg["id"].astype(int)))
+                        dur_map = dict(zip(deg_keys, all_deg["duration_years"].astype(int)))
+
+                        # per-row degree context, batch and estimated year in whole-column ops
+                        def _col(c):
+                            if not c:
+                                return pd.Series("", index=df_raw.index)
+                            return df_raw[c].fillna("").astype(str).str.strip()
+
+                        rolls, names = _col(roll_col), _col(name_col)
+                        emails, years_raw = _col(email_col), _col(year_col)
+                        deg_lc = _col(degree_col).str.lower()
+                        d_ids = deg_lc.map(id_map).fillna(degree_id).astype(int)
+                        durs  = deg_lc.map(dur_map).fillna(duration).astype(int)
+                        join_years = _join_years(rolls)
+                        batches = _batches_from_join(join_years, durs)
+                        est_years = _years_from_join(join_years, durs)
 
                         # Existing rolls in current degree (for duplicate skipping)
-                        existing = read_df("SELECT LOWER(roll) AS roll FROM students WHERE degree_id=?", (degree_id,))
+                        existing = read_df("SELECT roll_lc AS roll FROM students WHERE degree_id=?", (degree_id,))
                         existing_rolls = set(existing["roll"].dropna().tolist())
                         seen_in_file = set()
 
-                        rows, skipped = [], []
-                        for idx, r in df_raw.iterrows():
-                            roll = (r.get(roll_col) or "").strip()
-                            name = (r.get(name_col) or "").strip()
+                        rows = []
+                        skip_rows, skip_reasons = array("l"), []
+
+                        def _skip(row_number: int, reason: str) -> None:
+                            skip_rows.append(row_number)
+                            skip_reasons.append(reason)
+
+                        for idx, roll, name, email, y_raw, d_id, batch, est in zip(
+                            df_raw.index, rolls, names, emails, years_raw, d_ids, batches, est_years
+                        ):
                             if not roll or not name:
-                                skipped.append((idx + 1, "Missing roll or name"))
+                                _skip(idx + 1, "Missing roll or name")
                                 continue
 
-                            # per-row degree context
-                            csv_deg_name = (r.get(degree_col) or "").strip().lower() if degree_col else ""
-                            if csv_deg_name and csv_deg_name in deg_map:
-                                d_id, dur = deg_map[csv_deg_name]
-                            else:
-                                d_id, dur = degree_id, duration
-
                             # de-dupe logic (by roll within degree)
                             key = f"{roll.lower()}::{d_id}"
                             if skip_dupes:
                                 if roll.lower() in existing_rolls:
-                                    skipped.append((idx + 1, f"Duplicate roll in DB for this degree: {roll}"))
+                                    _skip(idx + 1, f"Duplicate roll in DB for this degree: {roll}")
                                     continue
                                 if key in seen_in_file:
-                                    skipped.append((idx + 1, f"Duplicate roll in this file for this degree: {roll}"))
+                                    _skip(idx + 1, f"Duplicate roll in this file for this degree: {roll}")
                                     continue
                                 seen_in_file.add(key)
 
-                            batch = _batch_from_roll(roll, dur)
-
                             # year: prefer CSV explicit; else estimate
                             yy = None
-                            if year_col and pd.notna(r.get(year_col)) and str(r.get(year_col)).strip():
+                            if y_raw:
                                 try:
-                                    yy = int(str(r.get(year_col)).strip())
+                                    yy = int(y_raw)
                                 except Exception:
-                                    skipped.append((idx + 1, f"Bad year value: {r.get(year_col)}"))
+                                    _skip(idx + 1, f"Bad year value: {y_raw}")
                                     yy = None
-                            if yy is None:
-                                yy = _year_from_roll_first_join(roll, dur)
-
-                            email = None
-                            if email_col and pd.notna(r.get(email_col)):
-                                e = str(r.get(email_col)).strip()
-                                email = e if e else None
+                            if yy is None and pd.notna(est):
+                                yy = int(est)
 
-                            rows.append((roll, name, yy, None, email, batch, d_id))
+                            rows.append((roll, name, yy, None, email or None, batch, int(d_id)))
 
                         # Preview
                         st.write("Preview (first 10 parsed rows):")
@@ -271,7 +381,7 @@ def render(user: dict):
                         st.dataframe(prev_df, use_container_width=True)
 
                         if not rows:
-                            st.warning(f"No valid rows found. Skipped: {len(skipped)}")
+                            st.warning(f"No valid rows found. Skipped: {len(skip_rows)}")
                         else:
                             if replace_mode:
                                 exec_sql("DELETE FROM students WHERE degree_id=?", (degree_id,))
@@ -286,26 +396,28 @@ def render(user: dict):
                             )["c"].iloc[0]
                             st.success(
                                 f"Imported {len(rows)} students into '{deg_sel}'. "
-                                f"{'Skipped ' + str(len(skipped)) + ' rows. ' if skipped else ''}"
+                                f"{'Skipped ' + str(len(skip_rows)) + ' rows. ' if skip_rows else ''}"
                                 f"Now this degree has {after} students."
                             )
-                            if skipped:
+                            if skip_rows:
                                 with st.expander("Why some rows were skipped?"):
-                                    st.dataframe(pd.DataFrame(skipped, columns=["row_number", "reason"]), use_container_width=True)
+                                    st.dataframe(
+                                        pd.DataFrame({
+                                            "row_number": skip_rows[:SKIPPED_SHOW_MAX],
+                                            "reason": skip_reasons[:SKIPPED_SHOW_MAX],
+                                        }),
+                                        use_container_width=True
+                                    )
+                                    if len(skip_rows) > SKIPPED_SHOW_MAX:
+                                        st.caption(f"Showing first {SKIPPED_SHOW_MAX} of {len(skip_rows)} skipped rows.")
                             st.rerun()
             except Exception as e:
                 st.error(f"Import failed: {e}")
 
     with exp_col:
-        df_cur = read_df(
-            "SELECT roll AS 'Roll No', name AS 'Student Name', COALESCE(email,'') AS Email, "
-            "COALESCE(batch,'') AS Batch, COALESCE(year,'') AS Year "
-            "FROM students WHERE degree_id=? ORDER BY roll",
-            (degree_id,)
-        )
         st.download_button(
             "Export current degree (CSV)",
-            data=df_to_csv_bytes(df_cur),
+            data=_export_students_csv(degree_id),
             file_name=f"students_{deg_sel.replace(' ', '_')}.csv",
             mime="text/csv"
         )
@@ -380,11 +492,14 @@ def render(user: dict):
 
         if editable:
             st.markdown("#### Delete selected")
+            id_label = dict(zip(
+                df_list["id"].astype(int).tolist(),
+                (df_list["Roll No"].astype(str) + " — " + df_list["Student Name"].astype(str)).tolist(),
+            ))
             ids = st.multiselect(
                 "Pick rows to delete",
-                options=df_list["id"].tolist(),
-                format_func=lambda i: f"{df_list.loc[df_list['id']==i, 'Roll No'].iloc[0]} — "
-                                      f"{df_list.loc[df_list['id']==i, 'Student Name'].iloc[0]}",
+                options=list(id_label),
+                format_func=id_label.get,
             )
             if st.button("Delete", disabled=(len(ids) == 0)):
                 try:
@@ -401,20 +516,27 @@ def render(user: dict):
         st.divider()
         st.markdown("### Maintenance")
         if st.button("Remove duplicates (by Roll No within this degree) — keep earliest"):
-            dups = read_df("""
-                WITH ranked AS (
-                  SELECT id, degree_id, LOWER(roll) AS roll, ROW_NUMBER() OVER(
-                    PARTITION BY degree_id, LOWER(roll) ORDER BY id ASC
-                  ) AS rn
-                  FROM students
-                )
-                SELECT id FROM ranked WHERE rn > 1 AND degree_id=?
-            """, (degree_id,))
-            if dups.empty:
+            with get_conn() as conn:
+                cur = conn.execute("""
+                    DELETE FROM students WHERE id IN (
+                      WITH ranked AS (
+                        SELECT id, ROW_NUMBER() OVER(
+                          PARTITION BY degree_id, roll_lc ORDER BY id ASC
+                        ) AS rn
+                        FROM students
+                        WHERE degree_id=?
+                      )
+                      SELECT id FROM ranked WHERE rn > 1
+                    )
+                """, (degree_id,))
+                n_removed = cur.rowcount
+                conn.commit()
+            if n_removed <= 0:
                 st.info("No duplicates found for this degree.")
             else:
-                exec_many("DELETE FROM students WHERE id=?", [(int(x),) for x in dups["id"].tolist()])
-                st.success(f"Removed {len(dups)} duplicate rows for this degree.")
+                # unique index may have been skipped over these duplicates; retry on next rerun
+                _SCHEMA_READY["students"] = False
+                st.success(f"Removed {n_removed} duplicate rows for this degree.")
                 st.rerun()
 
     render_footer()
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import pandas as pd
 import streamlit as st
 import sqlite3
@@ -10,7 +10,9 @@ from core.db import (
     exec_sql,
     exec_many,
     get_conn,
+    transaction,
     ensure_base_schema,
+    data_version,
 )
 
 ALLOWED_EDIT_ROLES = {"superadmin", "director", "principal"}
@@ -28,33 +30,70 @@ def _table_columns(table: str) -> List[str]:
     except Exception:
         return []
 
+# Schema is effectively fixed after the first migration in a process; skip the PRAGMA probes after that.
+_SCHEMA_READY = {"subject_offerings": False, "subject_offering_faculty": False}
+
 def _ensure_subject_offerings_columns():
     """
     Make sure subject_offerings has the columns we rely on.
     Adds columns if missing (safe no-op if they already exist).
+    Runs the checks once per process.
     """
-    cols = _table_columns("subject_offerings")
-    if not cols:
-        # Table not present at all – let ensure_base_schema create it.
-        ensure_base_schema()
+    if not _SCHEMA_READY["subject_offerings"]:
         cols = _table_columns("subject_offerings")
+        if not cols:
+            # Table not present at all – let ensure_base_schema create it.
+            ensure_base_schema()
+            cols = _table_columns("subject_offerings")
+
+        to_add = []
+        if "degree_id" not in cols:              to_add.append(("degree_id", "INTEGER"))
+        if "batch_year" not in cols:             to_add.append(("batch_year", "INTEGER"))
+        if "semester" not in cols:               to_add.append(("semester", "INTEGER"))
+        if "branch_id" not in cols:              to_add.append(("branch_id", "INTEGER"))
+        if "subject_id" not in cols:             to_add.append(("subject_id", "INTEGER"))
+        if "topic_id" not in cols:               to_add.append(("topic_id", "INTEGER"))
+        if "subject_in_charge_id" not in cols:   to_add.append(("subject_in_charge_id", "INTEGER"))
+        if "updated_at" not in cols:             to_add.append(("updated_at", "TEXT"))
+
+        if to_add:
+            with get_conn() as conn:
+                c = conn.cursor()
+                for name, typ in to_add:
+                    c.execute(f"ALTER TABLE subject_offerings ADD COLUMN {name} {typ}")
+                conn.commit()
+
+        # Logical identity of an offering; lets _ensure_offering upsert in one statement
+        try:
+            exec_sql("""
+                CREATE UNIQUE INDEX IF NOT EXISTS uq_so_identity ON subject_offerings(
+                    degree_id, batch_year, semester, IFNULL(branch_id,-1), subject_id, IFNULL(topic_id,-1)
+                )
+            """)
+        except sqlite3.Error:
+            # Pre-existing duplicates; _ensure_offering falls back to SELECT-then-INSERT.
+            pass
+        # Covers the grid snapshot (filter + ORDER BY + selected columns) without touching the table
+        try:
+            exec_sql("""
+                CREATE INDEX IF NOT EXISTS idx_so_lookup ON subject_offerings(
+                    degree_id, batch_year, semester, updated_at DESC, id DESC,
+                    subject_id, topic_id, branch_id, subject_in_charge_id
+                )
+            """)
+            exec_sql("ANALYZE subject_offerings")
+        except sqlite3.Error:
+            pass
+        # Subject lookups filter criteria by (degree, semester); the subjects side of the
+        # lower-cased code join uses idx_subjects_code_lc from core.db migrations
+        try:
+            exec_sql("CREATE INDEX IF NOT EXISTS idx_sc_degree_sem ON subject_criteria(degree_id, semester)")
+        except sqlite3.Error:
+            pass
+        _SCHEMA_READY["subject_offerings"] = True
 
-    to_add = []
-    if "degree_id" not in cols:              to_add.append(("degree_id", "INTEGER"))
-    if "batch_year" not in cols:             to_add.append(("batch_year", "INTEGER"))
-    if "semester" not in cols:               to_add.append(("semester", "INTEGER"))
-    if "branch_id" not in cols:              to_add.append(("branch_id", "INTEGER"))
-    if "subject_id" not in cols:             to_add.append(("subject_id", "INTEGER"))
-    if "topic_id" not in cols:               to_add.append(("topic_id", "INTEGER"))
-    if "subject_in_charge_id" not in cols:   to_add.append(("subject_in_charge_id", "INTEGER"))
-    if "updated_at" not in cols:             to_add.append(("updated_at", "TEXT"))
-
-    if to_add:
-        with get_conn() as conn:
-            c = conn.cursor()
-            for name, typ in to_add:
-                c.execute(f"ALTER TABLE subject_offerings ADD COLUMN {name} {typ}")
-            conn.commit()
+    if _SCHEMA_READY["subject_offering_faculty"]:
+        return
 
     # Ensure subject_offering_faculty exists
     cols2 = _table_columns("subject_offering_faculty")
@@ -71,6 +110,7 @@ def _ensure_subject_offerings_columns():
             for name, typ in need2:
                 c.execute(f"ALTER TABLE subject_offering_faculty ADD COLUMN {name} {typ}")
             conn.commit()
+    _SCHEMA_READY["subject_offering_faculty"] = True
 
 
 # ==============
@@ -80,6 +120,10 @@ def _ensure_subject_offerings_columns():
 def _can_edit(role: str) -> bool:
     return (role or "").lower() in ALLOWED_EDIT_ROLES
 
+def _notna(x) -> bool:
+    """Scalar missing-value check (None / NaN / pd.NA) that skips pd.notna's dispatch in hot loops."""
+    return x is not None and x is not pd.NA and x == x
+
 def _abs_sems_for_year(year: int) -> Tuple[int, int]:
     y = max(1, int(year or 1))
     s1 = 2 * (y - 1) + 1
@@ -92,13 +136,17 @@ def _compute_ay_label(ay_start: int) -> str:
         return "—"
     return f"{s}–{s+1}"
 
-def _degree_picker() -> Optional[pd.Series]:
-    df = read_df("SELECT id, name, COALESCE(duration_years,5) AS duration_years FROM degrees ORDER BY name")
+@st.cache_data(max_entries=8, show_spinner=False)
+def _degrees(version: int) -> pd.DataFrame:
+    return read_df("SELECT id, name, COALESCE(duration_years,5) AS duration_years FROM degrees ORDER BY name")
+
+def _degree_picker(version: int) -> Optional[pd.Series]:
+    df = _degrees(version)
     if df.empty:
         st.info("Add a Degree in the **Degrees** page first.")
         return None
     pick = st.selectbox("Degree / Program", df["name"].tolist(), index=0, key="sa_degree")
-    return df[df["name"] == pick].iloc[0]
+    return df.set_index("name", drop=False).loc[pick]
 
 def _batch_picker(degree_id: int) -> int:
     df = read_df("""
@@ -124,35 +172,38 @@ def _year_sem_picker(dur_years: int) -> Tuple[int, int]:
     sem = st.selectbox("Semester", [s1, s2], index=0, key="sa_sem")
     return y, int(sem)
 
-def _branches_for_degree(degree_id: int) -> pd.DataFrame:
+@st.cache_data(max_entries=64, show_spinner=False)
+def _branches_for_degree(version: int, degree_id: int) -> pd.DataFrame:
     df = read_df("SELECT id, name, branch_head_faculty_id FROM branches WHERE degree_id=? ORDER BY name", (int(degree_id),))
     if df.empty:
         return pd.DataFrame(columns=["id", "name", "branch_head_faculty_id"])
     return df
 
-def _faculty_lists() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+@st.cache_data(max_entries=8, show_spinner=False)
+def _faculty_lists(version: int) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     core = read_df("SELECT id, name FROM faculty WHERE LOWER(COALESCE(type,''))='core' ORDER BY name")
     visit= read_df("SELECT id, name FROM faculty WHERE LOWER(COALESCE(type,''))='visiting' ORDER BY name")
     allf = pd.concat([core, visit], ignore_index=True) if not core.empty or not visit.empty else pd.DataFrame(columns=["id","name"])
     return core, visit, allf
 
-def _fac_names(all_fac: pd.DataFrame, ids: List[int]) -> List[str]:
-    out = []
-    if all_fac.empty: return out
-    for fid in ids:
-        r = all_fac[all_fac["id"] == int(fid)]
-        if not r.empty:
-            out.append(str(r["name"].iloc[0]))
-    return out
+def _name_by_id(all_fac: pd.DataFrame) -> dict[int, str]:
+    if all_fac.empty: return {}
+    return dict(zip(all_fac["id"].astype(int).tolist(), all_fac["name"].astype(str).tolist()))
 
-def _ids_from_names(all_fac: pd.DataFrame, names: List[str]) -> List[int]:
-    out = []
-    for n in names:
-        r = all_fac[all_fac["name"] == n]
-        if not r.empty:
-            out.append(int(r["id"].iloc[0]))
+def _id_by_name(all_fac: pd.DataFrame) -> dict[str, int]:
+    if all_fac.empty: return {}
+    # first occurrence wins, matching the old row-filter lookup
+    out: dict[str, int] = {}
+    for fid, name in zip(all_fac["id"].astype(int).tolist(), all_fac["name"].tolist()):
+        out.setdefault(name, fid)
     return out
 
+def _fac_names(name_map: dict[int, str], ids: List[int]) -> List[str]:
+    return [name_map[int(fid)] for fid in ids if int(fid) in name_map]
+
+def _ids_from_names(id_map: dict[str, int], names: List[str]) -> List[int]:
+    return [id_map[n] for n in names if n in id_map]
+
 def _class_incharge_label(degree_id: int, ay_start: int, year: int) -> str:
     df = read_df("""
         SELECT b.name AS branch,
@@ -165,16 +216,19 @@ def _class_incharge_label(degree_id: int, ay_start: int, year: int) -> str:
     if df.empty:
         return "—"
     vals = []
-    for _, r in df.iterrows():
-        vals.append(f"{r['branch']}: {r['cic'] if pd.notna(r['cic']) else '—'}")
+    for t in df.itertuples(index=False):
+        vals.append(f"{t.branch}: {t.cic if pd.notna(t.cic) else '—'}")
     return "; ".join(vals)
 
 
 # =========================
 # Subject & Topic fetchers
 # =========================
+# Cached lookups take the DB data_version as their first argument: any commit, from
+# this page or another one (Faculty, Subject Criteria, ...), moves it and so misses the cache.
 
-def _subjects_for_sem(degree_id:int, sem:int, branch_id: Optional[int]) -> pd.DataFrame:
+@st.cache_data(max_entries=64, show_spinner=False)
+def _subjects_for_sem(version: int, degree_id:int, sem:int, branch_id: Optional[int]) -> pd.DataFrame:
     sql = """
         SELECT DISTINCT
             sc.id AS subject_id,
@@ -205,7 +259,8 @@ def _subjects_for_sem(degree_id:int, sem:int, branch_id: Optional[int]) -> pd.Da
     """, (int(degree_id), int(sem)))
     return df2
 
-def _topics_for_subject(subject_id: int) -> pd.DataFrame:
+@st.cache_data(max_entries=64, show_spinner=False)
+def _topics_for_subject(version: int, subject_id: int) -> pd.DataFrame:
     df = read_df("""
         SELECT id AS topic_id, topic_code, COALESCE(title,'') AS title
           FROM subject_topics
@@ -216,40 +271,88 @@ def _topics_for_subject(subject_id: int) -> pd.DataFrame:
         return pd.DataFrame(columns=["topic_id","topic_code","title"])
     return df
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def _topics_for_subjects(version: int, subject_ids: Tuple[int, ...]) -> pd.DataFrame:
+    """Topics for several subjects in one query (same per-subject order as _topics_for_subject)."""
+    if not subject_ids:
+        return pd.DataFrame(columns=["subject_id","topic_id","topic_code","title"])
+    return read_df(f"""
+        SELECT subject_id, id AS topic_id, topic_code, COALESCE(title,'') AS title
+          FROM subject_topics
+         WHERE subject_id IN ({','.join('?' * len(subject_ids))})
+         ORDER BY subject_id, topic_code, title
+    """, tuple(int(x) for x in subject_ids))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _code2sid(version: int, degree_id:int, sem:int) -> Dict[str, int]:
+    subs = read_df("""
+        SELECT id AS subject_id, code AS subject_code
+          FROM subject_criteria
+         WHERE degree_id=? AND semester=? AND code IS NOT NULL
+    """, (int(degree_id), int(sem)))
+    return dict(zip(subs["subject_code"].astype(str).str.lower(), subs["subject_id"].astype(int)))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _bname2bid(version: int, degree_id:int) -> Dict[str, int]:
+    br = read_df("SELECT id, name FROM branches WHERE degree_id=? ORDER BY name", (int(degree_id),))
+    return dict(zip(br["name"].astype(str).str.strip().str.lower(), br["id"].astype(int)))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _key2tid(version: int, degree_id:int, sem:int) -> Dict[Tuple[int, str], int]:
+    topics = read_df("""
+        SELECT t.id AS topic_id, t.topic_code, sc.id AS subject_id
+          FROM subject_topics t
+          JOIN subject_criteria sc ON sc.id=t.subject_id
+         WHERE sc.degree_id=? AND sc.semester=?
+    """, (int(degree_id), int(sem)))
+    return dict(zip(zip(topics["subject_id"].astype(int), topics["topic_code"].astype(str).str.lower()),
+                    topics["topic_id"].astype(int)))
+
 
 # ==============================
 # Allocation helpers (NEW schema)
 # ==============================
 
-def _ensure_offering(degree_id:int, batch_year:int, sem:int,
+def _upsert_offering(conn, degree_id:int, batch_year:int, sem:int,
                      branch_id: Optional[int], subject_id:int, topic_id: Optional[int]) -> int:
-    _ensure_subject_offerings_columns()
-    row = read_df("""
+    """Insert-or-find an offering on an open connection (caller owns the transaction)."""
+    params = (int(degree_id), int(batch_year), int(sem), branch_id, int(subject_id), topic_id)
+    try:
+        # Single atomic round-trip: insert, or hand back the existing row's id.
+        # The DO UPDATE is a deliberate no-op so render-time calls don't bump updated_at.
+        row = conn.execute("""
+            INSERT INTO subject_offerings(degree_id, batch_year, semester, branch_id, subject_id, topic_id)
+            VALUES(?,?,?,?,?,?)
+            ON CONFLICT(degree_id, batch_year, semester, IFNULL(branch_id,-1), subject_id, IFNULL(topic_id,-1))
+            DO UPDATE SET subject_id=excluded.subject_id
+            RETURNING id
+        """, params).fetchone()
+        return int(row[0])
+    except sqlite3.OperationalError:
+        # No identity index (legacy duplicates) or SQLite < 3.35 without RETURNING.
+        pass
+
+    row = conn.execute("""
         SELECT id FROM subject_offerings
          WHERE degree_id=? AND batch_year=? AND semester=?
            AND IFNULL(branch_id,-1)=IFNULL(?, -1)
            AND subject_id=? AND IFNULL(topic_id,-1)=IFNULL(?, -1)
-         LIMIT 1
-    """, (int(degree_id), int(batch_year), int(sem),
-          branch_id, int(subject_id), topic_id))
-    if not row.empty:
-        return int(row["id"].iloc[0])
+         ORDER BY id DESC LIMIT 1
+    """, params).fetchone()
+    if row:
+        return int(row[0])
 
-    exec_sql("""
+    cur = conn.execute("""
         INSERT INTO subject_offerings(degree_id, batch_year, semester, branch_id, subject_id, topic_id)
         VALUES(?,?,?,?,?,?)
-    """, (int(degree_id), int(batch_year), int(sem),
-          branch_id, int(subject_id), topic_id))
+    """, params)
+    return int(cur.lastrowid)
 
-    row2 = read_df("""
-        SELECT id FROM subject_offerings
-         WHERE degree_id=? AND batch_year=? AND semester=?
-           AND IFNULL(branch_id,-1)=IFNULL(?, -1)
-           AND subject_id=? AND IFNULL(topic_id,-1)=IFNULL(?, -1)
-         ORDER BY id DESC LIMIT 1
-    """, (int(degree_id), int(batch_year), int(sem),
-          branch_id, int(subject_id), topic_id))
-    return int(row2["id"].iloc[0])
+def _ensure_offering(degree_id:int, batch_year:int, sem:int,
+                     branch_id: Optional[int], subject_id:int, topic_id: Optional[int]) -> int:
+    _ensure_subject_offerings_columns()
+    with get_conn() as conn:
+        return _upsert_offering(conn, degree_id, batch_year, sem, branch_id, subject_id, topic_id)
 
 def _load_offering_members(offering_id:int) -> Tuple[Optional[int], List[int], List[int]]:
     a = read_df("SELECT subject_in_charge_id FROM subject_offerings WHERE id=?", (int(offering_id),))
@@ -266,10 +369,56 @@ def _load_offering_members(offering_id:int) -> Tuple[Optional[int], List[int], L
     stud_ids = [int(x) for x in (stud["faculty_id"].tolist() if not stud.empty else [])]
     return sic, lect_ids, stud_ids
 
-def _save_offering(offering_id:int, sic_id: Optional[int], lect_ids: List[int], stud_ids: List[int]) -> None:
+def _offerings_snapshot(degree_id:int, batch_year:int, sem:int) -> Tuple[dict, dict, dict]:
+    """
+    Bulk-load every offering (and its faculty) for one degree/batch/semester so the grid
+    doesn't query per row. Returns:
+      latest_branch: (subject_id, topic_id) -> branch_id of the most recently updated offering
+      by_identity:   (branch_id, subject_id, topic_id) -> (offering_id, sic_id)
+      members:       offering_id -> ([lecture ids], [studio ids])
+    """
+    offs = read_df("""
+        SELECT id, subject_id, topic_id, branch_id, subject_in_charge_id
+          FROM subject_offerings
+         WHERE degree_id=? AND batch_year=? AND semester=?
+         ORDER BY updated_at DESC, id DESC
+    """, (int(degree_id), int(batch_year), int(sem)))
+    latest_branch, by_identity = {}, {}
+    for oid, sid, tid, bid, sic in offs[["id", "subject_id", "topic_id", "branch_id", "subject_in_charge_id"]].itertuples(index=False):
+        tid = int(tid) if _notna(tid) else None
+        bid = int(bid) if _notna(bid) else None
+        latest_branch.setdefault((int(sid), tid), bid)
+        by_identity.setdefault((bid, int(sid), tid), (int(oid), int(sic) if _notna(sic) else None))
+
+    mem = read_df("""
+        SELECT sof.offering_id, sof.faculty_id, sof.role
+          FROM subject_offering_faculty sof
+          JOIN subject_offerings so ON so.id=sof.offering_id
+         WHERE so.degree_id=? AND so.batch_year=? AND so.semester=?
+         ORDER BY sof.faculty_id
+    """, (int(degree_id), int(batch_year), int(sem)))
+    members: dict = {}
+    for oid, fid, role in mem[["offering_id", "faculty_id", "role"]].itertuples(index=False):
+        lect, stud = members.setdefault(int(oid), ([], []))
+        if role == "lecture":
+            lect.append(int(fid))
+        elif role == "studio":
+            stud.append(int(fid))
+    return latest_branch, by_identity, members
+
+def _member_rows(offering_id:int, sic_id: Optional[int], lect_ids: List[int], stud_ids: List[int]) -> List[Tuple[int,int,str]]:
     total = (1 if sic_id else 0) + len(set(lect_ids)) + len(set(stud_ids))
     if total > 10:
         raise ValueError("Maximum 10 faculty allowed in total (including Subject In-Charge).")
+    return [(int(offering_id), int(fid), "lecture") for fid in sorted(set(lect_ids))] + \
+           [(int(offering_id), int(fid), "studio") for fid in sorted(set(stud_ids))]
+
+def _offering_state(sic_id: Optional[int], lect_ids: List[int], stud_ids: List[int]) -> Tuple:
+    """Order-insensitive view of an allocation, for skipping writes that change nothing."""
+    return (sic_id, tuple(sorted(set(lect_ids))), tuple(sorted(set(stud_ids))))
+
+def _save_offering(offering_id:int, sic_id: Optional[int], lect_ids: List[int], stud_ids: List[int]) -> None:
+    members = _member_rows(offering_id, sic_id, lect_ids, stud_ids)
 
     with get_conn() as conn:
         c = conn.cursor()
@@ -278,15 +427,10 @@ def _save_offering(offering_id:int, sic_id: Optional[int], lect_ids: List[int],
             (sic_id, int(offering_id))
         )
         c.execute("DELETE FROM subject_offering_faculty WHERE offering_id=?", (int(offering_id),))
-        for fid in sorted(set(lect_ids)):
-            c.execute(
-                "INSERT OR IGNORE INTO subject_offering_faculty(offering_id, faculty_id, role) VALUES(?,?, 'lecture')",
-                (int(offering_id), int(fid))
-            )
-        for fid in sorted(set(stud_ids)):
-            c.execute(
-                "INSERT OR IGNORE INTO subject_offering_faculty(offering_id, faculty_id, role) VALUES(?,?, 'studio')",
-                (int(offering_id), int(fid))
+        if members:
+            c.executemany(
+                "INSERT OR IGNORE INTO subject_offering_faculty(offering_id, faculty_id, role) VALUES(?,?,?)",
+                members
             )
         conn.commit()
 
@@ -299,103 +443,158 @@ def _export_grid(degree_id:int, batch_year:int, sem:int, branch_id: Optional[int
     _ensure_subject_offerings_columns()
     df = read_df("""
         SELECT so.id AS alloc_id,
-               COALESCE(sc.code, s.code) AS subject_code,
+               sc.code AS subject_code,
                t.topic_code,
                b.name AS branch_name,
                so.subject_in_charge_id AS sic_faculty_id,
-               GROUP_CONCAT(CASE WHEN sof.role='lecture' THEN sof.faculty_id END) AS lecture_faculty_ids,
-               GROUP_CONCAT(CASE WHEN sof.role='studio'  THEN sof.faculty_id END) AS studio_faculty_ids
+               sof.role,
+               sof.faculty_id
           FROM subject_offerings so
           LEFT JOIN subject_criteria sc ON sc.id=so.subject_id
-          LEFT JOIN subjects s
-                 ON s.degree_id=sc.degree_id    -- uses sc to be robust
-                AND s.semester=sc.semester
-                AND LOWER(COALESCE(s.code,''))=LOWER(COALESCE(sc.code,''))
           LEFT JOIN subject_topics t ON t.id=so.topic_id
           LEFT JOIN branches b ON b.id=so.branch_id
           LEFT JOIN subject_offering_faculty sof ON sof.offering_id=so.id
          WHERE sc.degree_id=? AND so.batch_year=? AND sc.semester=? AND IFNULL(so.branch_id,-1)=IFNULL(?, -1)
-         GROUP BY so.id, subject_code, t.topic_code, branch_name, so.subject_in_charge_id
-         ORDER BY subject_code, t.topic_code
+         ORDER BY subject_code, t.topic_code, so.id, sof.faculty_id
     """, (int(degree_id), int(batch_year), int(sem), branch_id))
-    return df.to_csv(index=False).encode("utf-8")
+
+    # one row per (offering, member) -> one row per offering with comma-joined id lists
+    grid = df.drop_duplicates("alloc_id")[["alloc_id", "subject_code", "topic_code", "branch_name", "sic_faculty_id"]]
+    grid = grid.astype({"sic_faculty_id": "Int64"})
+    mem = df.dropna(subset=["faculty_id"])
+    ids = (mem.groupby(["alloc_id", "role"])["faculty_id"]
+              .agg(lambda s: ",".join(map(str, s.astype(int))))
+              .unstack("role")
+              .reindex(columns=["lecture", "studio"])
+              .rename(columns={"lecture": "lecture_faculty_ids", "studio": "studio_faculty_ids"}))
+    grid = grid.merge(ids, left_on="alloc_id", right_index=True, how="left")
+    return grid.to_csv(index=False).encode("utf-8")
+
+_IMPORT_COLS = ["subject_code", "topic_code", "branch_name", "sic_faculty_id", "lecture_faculty_ids", "studio_faculty_ids"]
+_IMPORT_CHUNK_ROWS = 10_000
+_ID_TOKEN_RE = r"(?:^|,)\s*([+-]?\d+)\s*(?=,|$)"  # whole comma-separated integer tokens only
+
+def _classify_import_rows(df: pd.DataFrame, code2sid: Dict[str, int], bname2bid: Dict[str, int],
+                          topic_keys: pd.DataFrame, branch_id_page: Optional[int]) -> pd.DataFrame:
+    """Resolve subject/topic/branch ids and faculty id lists for a chunk of import rows, in bulk."""
+    df = df.reindex(columns=_IMPORT_COLS).fillna("").astype(str)
+    df["subject_id"] = df["subject_code"].str.strip().str.lower().map(code2sid).astype("Int64")
+    df["tcode"] = df["topic_code"].str.strip().str.lower()
+    df = df.merge(topic_keys, on=["subject_id", "tcode"], how="left")
+
+    bname = df["branch_name"].str.strip()
+    df["branch_id"] = bname.str.lower().map(bname2bid).astype("Int64")
+    df.loc[bname == "", "branch_id"] = branch_id_page
+
+    df["sic_id"] = pd.to_numeric(df["sic_faculty_id"].str.strip(), errors="coerce")
+
+    for col, out in (("lecture_faculty_ids", "lect_ids"), ("studio_faculty_ids", "stud_ids")):
+        df[out] = df[col].str.findall(_ID_TOKEN_RE).map(lambda xs: list(map(int, xs)))
+
+    df["valid"] = df["subject_id"].notna() & ((df["tcode"] == "") | df["topic_id"].notna())
+    return df
 
 def _import_grid(degree_id:int, batch_year:int, sem:int, branch_id_page: Optional[int], fp) -> Tuple[int,int]:
     _ensure_subject_offerings_columns()
-    df = pd.read_csv(fp)
-    ok = 0; skip = 0
-
-    subs = read_df("""
-        SELECT sc.id AS subject_id, COALESCE(sc.code, s.code) AS subject_code
-          FROM subject_criteria sc
-          LEFT JOIN subjects s
-                 ON s.degree_id=sc.degree_id
-                AND s.semester=sc.semester
-                AND LOWER(COALESCE(s.code,''))=LOWER(COALESCE(sc.code,''))
-         WHERE sc.degree_id=? AND sc.semester=?
-    """, (int(degree_id), int(sem)))
-    code2sid = {str(r["subject_code"]).lower(): int(r["subject_id"]) for _, r in subs.iterrows()}
-
-    br = read_df("SELECT id, name FROM branches WHERE degree_id=? ORDER BY name", (int(degree_id),))
-    bname2bid = {str(r["name"]).strip().lower(): int(r["id"]) for _, r in br.iterrows()}
+    # Read only the columns we use, as strings, a chunk at a time
+    reader = pd.read_csv(fp, dtype=str, keep_default_na=False,
+                         usecols=lambda c: c in _IMPORT_COLS, chunksize=_IMPORT_CHUNK_ROWS)
+
+    version = data_version()
+    code2sid = _code2sid(version, int(degree_id), int(sem))
+    bname2bid = _bname2bid(version, int(degree_id))
+    topic_keys = pd.DataFrame(
+        [(sid, tcode, tid) for (sid, tcode), tid in _key2tid(version, int(degree_id), int(sem)).items()],
+        columns=["subject_id", "tcode", "topic_id"],
+    ).astype({"subject_id": "Int64", "topic_id": "Int64"})
+
+    # Current state of existing offerings, so rows that change nothing are not rewritten
+    _, by_identity, saved_members = _offerings_snapshot(degree_id, batch_year, sem)
+    saved_state = {oid: _offering_state(sic, *saved_members.get(oid, ([], [])))
+                   for oid, sic in by_identity.values()}
 
-    topics = read_df("""
-        SELECT t.id AS topic_id, t.topic_code, sc.id AS subject_id
-          FROM subject_topics t
-          JOIN subject_criteria sc ON sc.id=t.subject_id
-         WHERE sc.degree_id=? AND sc.semester=?
-    """, (int(degree_id), int(sem)))
-    key2tid = {(int(r["subject_id"]), str(r["topic_code"]).lower()): int(r["topic_id"]) for _, r in topics.iterrows()}
-
-    def _parse_ids(s: str) -> List[int]:
-        if pd.isna(s) or str(s).strip()=="":
-            return []
-        out=[]
-        for tok in str(s).split(","):
-            tok = tok.strip()
-            if not tok: continue
-            try: out.append(int(tok))
-            except: pass
-        return out
-
-    for _, r in df.iterrows():
-        scode = str(r.get("subject_code","")).strip().lower()
-        if not scode or scode not in code2sid:
-            skip += 1; continue
-        subject_id = code2sid[scode]
-
-        tcode = str(r.get("topic_code","")).strip().lower()
-        topic_id = None
-        if tcode:
-            topic_id = key2tid.get((subject_id, tcode))
-            if topic_id is None:
-                skip += 1; continue
-
-        bname = r.get("branch_name")
-        if pd.isna(bname) or str(bname).strip()=="":
-            branch_id = branch_id_page
-        else:
-            branch_id = bname2bid.get(str(bname).strip().lower())
-
-        sic_id = None
-        try:
-            if pd.notna(r.get("sic_faculty_id")):
-                sic_id = int(r.get("sic_faculty_id"))
-        except Exception:
-            sic_id = None
-
-        lect_ids = _parse_ids(r.get("lecture_faculty_ids"))
-        stud_ids = _parse_ids(r.get("studio_faculty_ids"))
-
-        try:
-            offering_id = _ensure_offering(int(degree_id), int(batch_year), int(sem), branch_id, int(subject_id), topic_id)
-            _save_offering(offering_id, sic_id, lect_ids, stud_ids)
-            ok += 1
-        except Exception:
-            skip += 1
+    ok = 0; skip = 0
+    sic_rows: Dict[int, Optional[int]] = {}
+    members: Dict[int, List[Tuple[int,int,str]]] = {}  # last row for an offering wins
+    # ---- one transaction for the whole grid; take the write lock up front ----
+    with transaction() as conn:
+        for chunk in reader:
+            df = _classify_import_rows(chunk, code2sid, bname2bid, topic_keys, branch_id_page)
+            skip += int((~df["valid"]).sum())
+            rows = df.loc[df["valid"], ["branch_id", "subject_id", "topic_id", "sic_id", "lect_ids", "stud_ids"]]
+            for b, sid, tid, sic, lect_ids, stud_ids in rows.itertuples(index=False):
+                branch_id = int(b) if _notna(b) else None
+                topic_id = int(tid) if _notna(tid) else None
+                sic_id = int(sic) if _notna(sic) else None
+                try:
+                    mem = _member_rows(0, sic_id, lect_ids, stud_ids)
+                    offering_id = _upsert_offering(conn, degree_id, batch_year, sem, branch_id, int(sid), topic_id)
+                    if saved_state.get(offering_id) == _offering_state(sic_id, lect_ids, stud_ids):
+                        # unchanged; also drop any earlier row for this offering in the same file
+                        sic_rows.pop(offering_id, None)
+                        members.pop(offering_id, None)
+                    else:
+                        sic_rows[offering_id] = sic_id
+                        members[offering_id] = [(offering_id, fid, role) for _, fid, role in mem]
+                    ok += 1
+                except Exception:
+                    skip += 1
+        conn.executemany(
+            "UPDATE subject_offerings SET subject_in_charge_id=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+            [(sic, off) for off, sic in sic_rows.items()]
+        )
+        conn.executemany("DELETE FROM subject_offering_faculty WHERE offering_id=?", [(off,) for off in members])
+        conn.executemany(
+            "INSERT OR IGNORE INTO subject_offering_faculty(offering_id, faculty_id, role) VALUES(?,?,?)",
+            [m for grp in members.values() for m in grp]
+        )
 
     return ok, skip
 
+def _clone_offerings(degree_id:int, from_year:int, to_year:int, sem:int, branch_id: Optional[int]) -> int:
+    """Copy offerings (SIC + members) from one batch to another. Returns the number of source rows."""
+    _ensure_subject_offerings_columns()
+    params = (int(degree_id), int(from_year), int(sem), branch_id)
+    src = read_df("""
+        SELECT id, subject_id, topic_id, branch_id, subject_in_charge_id
+          FROM subject_offerings
+         WHERE degree_id=? AND batch_year=? AND semester=? AND IFNULL(branch_id,-1)=IFNULL(?, -1)
+    """, params)
+    if src.empty:
+        return 0
+
+    mem_all = read_df("""
+        SELECT offering_id, faculty_id, role
+          FROM subject_offering_faculty
+         WHERE offering_id IN (
+               SELECT id FROM subject_offerings
+                WHERE degree_id=? AND batch_year=? AND semester=? AND IFNULL(branch_id,-1)=IFNULL(?, -1))
+    """, params)
+    src_members: Dict[int, List[Tuple[int,str]]] = {}
+    for oid, fid, role in mem_all.itertuples(index=False):
+        src_members.setdefault(int(oid), []).append((int(fid), str(role)))
+
+    sic_rows: Dict[int, Optional[int]] = {}
+    members: Dict[int, List[Tuple[int,int,str]]] = {}  # last source row for a target wins
+    with get_conn() as conn:
+        for oid, sid, tid, bid, sic in src.itertuples(index=False):
+            off_now = _upsert_offering(conn, degree_id, to_year, sem,
+                                       int(bid) if _notna(bid) else None, int(sid),
+                                       int(tid) if _notna(tid) else None)
+            sic_rows[off_now] = int(sic) if _notna(sic) else None
+            members[off_now] = [(off_now, fid, role) for fid, role in src_members.get(int(oid), [])]
+        conn.executemany(
+            "UPDATE subject_offerings SET subject_in_charge_id=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+            [(sic, off) for off, sic in sic_rows.items()]
+        )
+        conn.executemany("DELETE FROM subject_offering_faculty WHERE offering_id=?", [(off,) for off in members])
+        conn.executemany(
+            "INSERT OR IGNORE INTO subject_offering_faculty(offering_id, faculty_id, role) VALUES(?,?,?)",
+            [m for grp in members.values() for m in grp]
+        )
+        conn.commit()
+    return len(src)
+
 
 # === UI ===
 
@@ -411,7 +610,9 @@ def render(user: dict):
     st.header("Faculty → Subject Allocation")
     can_edit = _can_edit(user.get("role",""))
 
-    drow = _degree_picker()
+    # cached lookups below are keyed on this, so edits made on other pages show up at once
+    version = data_version()
+    drow = _degree_picker(version)
     if drow is None: return
     degree_id = int(drow["id"])
     dur_years = int(drow["duration_years"])
@@ -419,31 +620,41 @@ def render(user: dict):
     ay_start = _batch_picker(degree_id)
     year, sem = _year_sem_picker(dur_years)
 
-    branches = _branches_for_degree(degree_id)
+    branches = _branches_for_degree(version, degree_id)
+    bid2bname = dict(zip(branches["id"].astype(int), branches["name"]))
+    bid2bh = {int(b): int(h) for b, h in zip(branches["id"], branches["branch_head_faculty_id"]) if _notna(h)}
+    bname2bid: dict[str, int] = {}
+    for bid, bname in bid2bname.items():
+        bname2bid.setdefault(bname, bid)  # first match wins, as the old row filter did
     br_options = ["— All / Not branch-specific —"] + (branches["name"].tolist() if not branches.empty else [])
     br_pick = st.selectbox("Filter by Branch (optional)", br_options, index=0, key="sa_page_branch")
-    branch_filter_id = None if br_pick == "— All / Not branch-specific —" else int(branches[branches["name"]==br_pick]["id"].iloc[0])
+    branch_filter_id = None if br_pick == "— All / Not branch-specific —" else bname2bid[br_pick]
 
     st.caption(f"**Academic Year:** {_compute_ay_label(ay_start)}  |  **Class In-Charge(s):** {_class_incharge_label(degree_id, ay_start, year)}")
     st.divider()
 
-    subs = _subjects_for_sem(degree_id, sem, branch_filter_id)
+    subs = _subjects_for_sem(version, degree_id, sem, branch_filter_id)
     if subs.empty:
         st.info("No subjects found for the chosen Degree + Semester.")
         return
 
-    core, visit, allfac = _faculty_lists()
-
-    rows = []
-    for _, srow in subs.iterrows():
-        sid   = int(srow["subject_id"])
-        scode = str(srow["subject_code"])
-        sname = str(srow["subject_name"])
-        rows.append({"subject_id": sid, "subject_code": scode, "subject_name": sname, "topic_id": None, "topic_code": "", "title": ""})
-        tops = _topics_for_subject(sid)
-        for _, t in tops.iterrows():
-            rows.append({"subject_id": sid, "subject_code": scode, "subject_name": sname,
-                         "topic_id": int(t["topic_id"]), "topic_code": str(t["topic_code"] or ""), "title": str(t["title"] or "")})
+    core, visit, allfac = _faculty_lists(version)
+
+    # One grid row per subject, followed by one per topic, in the subject list's order
+    subj = pd.DataFrame({
+        "subject_id": subs["subject_id"].astype(int),
+        "subject_code": subs["subject_code"].astype(str),
+        "subject_name": subs["subject_name"].astype(str),
+        "_pos": range(len(subs)),
+    })
+    sub_ids = tuple(sorted(set(subj["subject_id"].tolist())))
+    tops = subj.merge(_topics_for_subjects(version, sub_ids), on="subject_id", how="inner")
+    tops = tops.assign(topic_code=tops["topic_code"].fillna("").astype(str),
+                       title=tops["title"].fillna("").astype(str), _topic=1)
+    heads = subj.assign(topic_id=None, topic_code="", title="", _topic=0)
+    grid = pd.concat([heads, tops], ignore_index=True).sort_values(["_pos", "_topic"], kind="stable")
+    rows = list(grid[["subject_id", "subject_code", "subject_name", "topic_id", "topic_code", "title"]]
+                .astype({"topic_id": object}).itertuples(index=False, name="Row"))
 
     st.markdown("### Allocation Grid")
     st.caption("Tip: Set **Branch** (optional), then **SIC** (core only), then **Lecture/Studio**. Max 10 people (including SIC) per row.")
@@ -468,33 +679,9 @@ def render(user: dict):
             submitted = st.form_submit_button("Clone", disabled=not can_edit, use_container_width=True)
             if submitted:
                 try:
-                    src = read_df("""
-                        SELECT id, subject_id, topic_id, branch_id, subject_in_charge_id
-                          FROM subject_offerings
-                         WHERE degree_id=? AND batch_year=? AND semester=? AND IFNULL(branch_id,-1)=IFNULL(?, -1)
-                    """, (degree_id, int(clone_from), sem, branch_filter_id))
-                    if src.empty:
+                    if _clone_offerings(degree_id, int(clone_from), ay_start, sem, branch_filter_id) == 0:
                         st.warning("Nothing to clone for the chosen source batch.")
                     else:
-                        with get_conn() as conn:
-                            c = conn.cursor()
-                            for _, r in src.iterrows():
-                                sid = int(r["subject_id"])
-                                tid = int(r["topic_id"]) if pd.notna(r["topic_id"]) else None
-                                bid = int(r["branch_id"]) if pd.notna(r["branch_id"]) else None
-                                off_now = _ensure_offering(degree_id, ay_start, sem, bid, sid, tid)
-                                c.execute(
-                                    "UPDATE subject_offerings SET subject_in_charge_id=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
-                                    (int(r["subject_in_charge_id"]) if pd.notna(r["subject_in_charge_id"]) else None, off_now)
-                                )
-                                c.execute("DELETE FROM subject_offering_faculty WHERE offering_id=?", (off_now,))
-                                mem = read_df("SELECT faculty_id, role FROM subject_offering_faculty WHERE offering_id=?", (int(r["id"]),))
-                                for _, m in mem.iterrows():
-                                    c.execute(
-                                        "INSERT OR IGNORE INTO subject_offering_faculty(offering_id, faculty_id, role) VALUES(?,?,?)",
-                                        (int(off_now), int(m["faculty_id"]), str(m["role"]))
-                                    )
-                            conn.commit()
                         st.success("Cloned allocations.")
                         st.rerun()
                 except Exception as e:
@@ -503,18 +690,29 @@ def render(user: dict):
     st.divider()
 
     branch_names = branches["name"].tolist() if not branches.empty else []
-    fid2name = {}
-    if not (core.empty and visit.empty):
-        fac = pd.concat([core, visit], ignore_index=True) if not core.empty or not visit.empty else pd.DataFrame(columns=["id","name"])
-        for _, r in fac.iterrows(): fid2name[int(r["id"])] = str(r["name"])
+    br_label_list = ["— Not branch-specific —"] + branch_names
+    fid2name = _name_by_id(allfac)
+    fname2id = _id_by_name(allfac)
+    core_names = core["name"].tolist() if not core.empty else []
+    sic_names = ["— None —"] + core_names
+    all_names = allfac["name"].tolist()
+
+    # One pass over offerings/members + catalog SIC defaults instead of several queries per row
+    latest_branch, by_identity, members = _offerings_snapshot(degree_id, ay_start, sem)
+    crit = read_df(
+        f"SELECT id, subject_in_charge_id FROM subject_criteria "
+        f"WHERE id IN ({','.join('?' * len(sub_ids))}) AND subject_in_charge_id IS NOT NULL",
+        tuple(sub_ids)
+    )
+    sic_defaults = dict(zip(crit["id"].astype(int), crit["subject_in_charge_id"].astype(int)))
 
     idx = 0
     for r in rows:
         idx += 1
-        sid = int(r["subject_id"])
-        tid = int(r["topic_id"]) if r["topic_id"] not in (None, "", pd.NA) else None
-        scode = r["subject_code"]; sname = r["subject_name"]
-        tcode = r["topic_code"];  ttitle= r["title"]
+        sid = int(r.subject_id)
+        tid = int(r.topic_id) if _notna(r.topic_id) else None
+        scode = r.subject_code; sname = r.subject_name
+        tcode = r.topic_code;  ttitle= r.title
 
         header = f"{idx}. `{scode}` — {sname}"
         if tid:
@@ -522,31 +720,20 @@ def render(user: dict):
 
         with st.expander(header, expanded=False):
             # pre-load current saved branch
-            curr = read_df("""
-                SELECT branch_id FROM subject_offerings
-                 WHERE degree_id=? AND batch_year=? AND semester=?
-                   AND subject_id=? AND IFNULL(topic_id,-1)=IFNULL(?, -1)
-                 ORDER BY updated_at DESC, id DESC LIMIT 1
-            """, (degree_id, ay_start, sem, sid, tid))
+            curr_bid = latest_branch.get((sid, tid))
             br_default_index = 0
-            br_label_list = ["— Not branch-specific —"] + branch_names
             current_branch_id = None
-            if not curr.empty and pd.notna(curr["branch_id"].iloc[0]):
-                bid = int(curr["branch_id"].iloc[0])
-                if not branches.empty:
-                    nm = branches[branches["id"]==bid]["name"]
-                    if not nm.empty:
-                        try:
-                            br_default_index = br_label_list.index(str(nm.iloc[0]))
-                            current_branch_id = bid
-                        except Exception:
-                            pass
+            if curr_bid in bid2bname:
+                try:
+                    br_default_index = br_label_list.index(str(bid2bname[curr_bid]))
+                    current_branch_id = curr_bid
+                except ValueError:
+                    pass
             if current_branch_id is None and branch_filter_id is not None:
-                nm = branches[branches["id"]==branch_filter_id]["name"]
-                if not nm.empty:
+                if branch_filter_id in bid2bname:
                     try:
-                        br_default_index = br_label_list.index(str(nm.iloc[0]))
-                    except Exception:
+                        br_default_index = br_label_list.index(str(bid2bname[branch_filter_id]))
+                    except ValueError:
                         pass
                 current_branch_id = branch_filter_id
 
@@ -556,32 +743,24 @@ def render(user: dict):
                 index=br_default_index,
                 key=f"sa_row_branch_{degree_id}_{ay_start}_{sem}_{sid}_{tid}",
             )
-            sel_branch_id = None
-            if br_pick != "— Not branch-specific —":
-                sel_branch_id = int(branches[branches["name"] == br_pick]["id"].iloc[0])
-
-            bh_name = "—"
-            if sel_branch_id is not None:
-                bh = read_df("SELECT branch_head_faculty_id FROM branches WHERE id=?", (int(sel_branch_id),))
-                if not bh.empty and pd.notna(bh["branch_head_faculty_id"].iloc[0]):
-                    bh_name = fid2name.get(int(bh["branch_head_faculty_id"].iloc[0]), "—")
-            st.write(f"**Branch Head:** {bh_name}")
+            sel_branch_id = None if br_pick == "— Not branch-specific —" else bname2bid[br_pick]
 
-            offering_id = _ensure_offering(degree_id, ay_start, sem, sel_branch_id, sid, tid)
+            bh_id = bid2bh.get(sel_branch_id)
+            bh_name = fid2name.get(bh_id, "—") if bh_id is not None else "—"
+            st.write(f"**Branch Head:** {bh_name}")
 
-            sic_cur, lect_ids_cur, stud_ids_cur = _load_offering_members(offering_id)
+            known = by_identity.get((sel_branch_id, sid, tid))
+            if known is not None:
+                offering_id, sic_cur = known
+                lect_ids_cur, stud_ids_cur = members.get(offering_id, ([], []))
+            else:
+                offering_id = _ensure_offering(degree_id, ay_start, sem, sel_branch_id, sid, tid)
+                sic_cur, lect_ids_cur, stud_ids_cur = _load_offering_members(offering_id)
+            saved_state = _offering_state(sic_cur, lect_ids_cur, stud_ids_cur)
             if sic_cur is None:
-                d0 = read_df("SELECT sic_faculty_id FROM subject_criteria WHERE id=?", (sid,))
-                if not d0.empty and pd.notna(d0["sic_faculty_id"].iloc[0]):
-                    sic_cur = int(d0["sic_faculty_id"].iloc[0])
-
-            core_names = core["name"].tolist() if not core.empty else []
-            sic_names = ["— None —"] + core_names
-            default_sic_name = "— None —"
-            if sic_cur is not None:
-                nm = read_df("SELECT name FROM faculty WHERE id=?", (int(sic_cur),))
-                if not nm.empty:
-                    default_sic_name = nm["name"].iloc[0]
+                sic_cur = sic_defaults.get(sid)
+
+            default_sic_name = fid2name.get(int(sic_cur), "— None —") if sic_cur is not None else "— None —"
 
             sic_pick = st.selectbox(
                 "Subject In-Charge (core only)",
@@ -589,14 +768,10 @@ def render(user: dict):
                 index=(sic_names.index(default_sic_name) if default_sic_name in sic_names else 0),
                 key=f"sa_row_sic_{degree_id}_{ay_start}_{sem}_{sid}_{tid}",
             )
-            sic_id = None if sic_pick == "— None —" else int(core[core["name"]==sic_pick]["id"].iloc[0])
+            sic_id = None if sic_pick == "— None —" else fname2id.get(sic_pick)
 
-            all_names = (pd.concat([core, visit], ignore_index=True)["name"].tolist()
-                         if (not core.empty or not visit.empty) else [])
-            default_lect_names = _fac_names(pd.concat([core, visit], ignore_index=True) if (not core.empty or not visit.empty) else pd.DataFrame(columns=["id","name"]),
-                                            list(set(lect_ids_cur + ([sic_id] if sic_id else []))))
-            default_stud_names = _fac_names(pd.concat([core, visit], ignore_index=True) if (not core.empty or not visit.empty) else pd.DataFrame(columns=["id","name"]),
-                                            list(set(stud_ids_cur + ([sic_id] if sic_id else []))))
+            default_lect_names = _fac_names(fid2name, list(set(lect_ids_cur + ([sic_id] if sic_id else []))))
+            default_stud_names = _fac_names(fid2name, list(set(stud_ids_cur + ([sic_id] if sic_id else []))))
 
             lect_sel = st.multiselect(
                 "Lecture Faculty (include SIC if they also lecture)",
@@ -611,31 +786,33 @@ def render(user: dict):
                 key=f"sa_row_stud_{degree_id}_{ay_start}_{sem}_{sid}_{tid}",
             )
 
-            allfac_df = pd.concat([core, visit], ignore_index=True) if (not core.empty or not visit.empty) else pd.DataFrame(columns=["id","name"])
-            lect_ids = _ids_from_names(allfac_df, lect_sel)
-            stud_ids = _ids_from_names(allfac_df, stud_sel)
+            lect_ids = _ids_from_names(fname2id, lect_sel)
+            stud_ids = _ids_from_names(fname2id, stud_sel)
 
             all_union = sorted(set(lect_sel) | set(stud_sel))
             st.write("**All Faculty (computed):** " + (", ".join(all_union) if all_union else "—"))
 
             if st.button("Save row", disabled=not can_edit, key=f"sa_row_save_{degree_id}_{ay_start}_{sem}_{sid}_{tid}"):
-                try:
-                    _save_offering(offering_id, sic_id, lect_ids, stud_ids)
-                    st.success("Saved.")
-                except Exception as e:
-                    st.error(f"Save failed: {e}")
+                if _offering_state(sic_id, lect_ids, stud_ids) == saved_state:
+                    st.info("No changes to save.")
+                else:
+                    try:
+                        _save_offering(offering_id, sic_id, lect_ids, stud_ids)
+                        st.success("Saved.")
+                    except Exception as e:
+                        st.error(f"Save failed: {e}")
 
             st.markdown("---")
             st.markdown("**Topics (Electives / College Projects)**")
             cta1, cta2 = st.columns([1,1])
             with cta1:
-                if st.button("Add topic", disabled=not can_edit, key=f"sa_add_topic_{sid}"):
-                    tdf = _topics_for_subject(sid)
+                if st.button("Add topic", disabled=not can_edit, key=f"sa_add_topic_{sid}_{tid}"):
+                    tdf = _topics_for_subject(version, sid)
                     pref = 'e' if scode.lower().startswith('e') else ('p' if scode.lower().startswith('p') else 't')
                     base_num = ''.join([ch for ch in scode if ch.isdigit()]) or scode.lower()
                     max_n = 0
-                    for _, rr in tdf.iterrows():
-                        tc = str(rr["topic_code"] or "")
+                    for rr in tdf.itertuples(index=False):
+                        tc = str(rr.topic_code or "")
                         if '-' in tc:
                             try:
                                 n = int(tc.split('-')[-1]); max_n = max(max_n, n)
@@ -648,18 +825,20 @@ def render(user: dict):
                     except Exception as e:
                         st.error(f"Add topic failed: {e}")
             with cta2:
-                tops_df = _topics_for_subject(sid)
-                opts = ["— Select topic to delete —"] + [str(x) for x in tops_df["topic_code"].tolist()]
-                which = st.selectbox("Delete topic (careful)", opts, index=0, key=f"sa_del_topic_pick_{sid}")
+                tops_df = _topics_for_subject(version, sid)
+                tops_by_code = (tops_df.assign(topic_code=tops_df["topic_code"].astype(str))
+                                       .drop_duplicates("topic_code").set_index("topic_code"))
+                opts = ["— Select topic to delete —"] + tops_by_code.index.tolist()
+                which = st.selectbox("Delete topic (careful)", opts, index=0, key=f"sa_del_topic_pick_{sid}_{tid}")
                 if which != "— Select topic to delete —":
-                    tid_del = int(tops_df[tops_df["topic_code"] == which]["topic_id"].iloc[0])
-                    if st.button("Confirm delete topic", type="secondary", key=f"sa_del_topic_btn_{sid}"):
+                    tid_del = int(tops_by_code.at[which, "topic_id"])
+                    if st.button("Confirm delete topic", type="secondary", key=f"sa_del_topic_btn_{sid}_{tid}"):
                         try:
                             with get_conn() as conn:
                                 c = conn.cursor()
                                 offs = read_df("SELECT id FROM subject_offerings WHERE subject_id=? AND topic_id=?", (int(sid), int(tid_del)))
-                                for _, orow in offs.iterrows():
-                                    c.execute("DELETE FROM subject_offering_faculty WHERE offering_id=?", (int(orow["id"]),))
+                                for orow in offs.itertuples(index=False):
+                                    c.execute("DELETE FROM subject_offering_faculty WHERE offering_id=?", (int(orow.id),))
                                 c.execute("DELETE FROM subject_offerings WHERE subject_id=? AND topic_id=?", (int(sid), int(tid_del)))
                                 c.execute("DELETE FROM subject_topics WHERE id=?", (int(tid_del),))
                                 conn.commit()
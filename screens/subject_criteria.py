@@ -1,6 +1,7 @@
 # screens/subject_criteria.py
 from __future__ import annotations
 
+import csv
 import io
 from typing import List, Tuple
 
@@ -8,28 +9,36 @@ import numpy as np
 import pandas as pd
 import streamlit as st
 
-from core.db import read_df, exec_sql, exec_many
+from core.db import read_df, exec_sql, exec_sql_returning_id, transaction, data_version
 from core.theme import render_theme_css
 from core.branding import render_header, render_footer
 
 # ------------------------ Constants / helpers ------------------------
 
 EDIT_ROLES = {"superadmin", "principal", "director"}
+ALL_EDIT_ROLES = frozenset(EDIT_ROLES | {"class_in_charge", "subject_in_charge"})
 SUBJECT_TYPES = ["core", "elective", "college_project"]  # shown in add/edit
 
 
 def _user_can_edit(user: dict) -> bool:
-    role = (user or {}).get("role", "").lower()
-    return role in EDIT_ROLES or role in {"class_in_charge", "subject_in_charge"}
+    return ((user or {}).get("role") or "").lower() in ALL_EDIT_ROLES
 
 
-def _degrees_df():
+# keyed on the DB data_version: edits on the Degrees page (or any other commit) miss the cache
+@st.cache_data(max_entries=8, show_spinner=False)
+def _degrees_df(version: int):
     return read_df("""
         SELECT id, name, COALESCE(duration_years,5) AS duration_years
         FROM degrees ORDER BY name
     """)
 
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def _degree_duration(version: int, degree_id: int) -> int:
+    q = read_df("SELECT COALESCE(duration_years,5) AS duration_years FROM degrees WHERE id=?", (int(degree_id),))
+    return int(q["duration_years"].iloc[0]) if not q.empty else 5
+
+
 def _subjects_scope_df(degree_id: int, year: int, sem_abs: int):
     return read_df("""
         SELECT id, code, name, COALESCE(subject_type,'core') AS subject_type,
@@ -101,7 +110,7 @@ def _save_subject_master(data: dict, subject_id: int | None) -> int:
         ))
         return int(subject_id)
     else:
-        exec_sql("""
+        new_id = exec_sql_returning_id("""
             INSERT INTO subjects(code, name, degree_id, year, semester, subject_type,
                                  credits, lectures, studios, internal_marks, external_exam_marks, external_jury_marks,
                                  default_start_date, default_end_date)
@@ -112,8 +121,7 @@ def _save_subject_master(data: dict, subject_id: int | None) -> int:
             int(data["internal_marks"] or 0), int(data["external_exam_marks"] or 0), int(data["external_jury_marks"] or 0),
             data["default_start_date"], data["default_end_date"]
         ))
-        new_id = read_df("SELECT MAX(id) AS id FROM subjects").iloc[0]["id"]
-        return int(new_id)
+        return new_id
 
 
 def _save_attainment(subject_id: int, a: dict):
@@ -136,32 +144,39 @@ def _save_attainment(subject_id: int, a: dict):
 
 # ---------- Import / Duplicate check / Export helpers (catalog) ----------
 
-def _to_int(x, default=0):
-    try:
-        return int(x) if pd.notna(x) and str(x).strip() != "" else default
-    except Exception:
-        return default
+def _num_col(col: pd.Series, default) -> pd.Series:
+    """Parse a text column as numbers (float); blank, unparseable or non-finite cells become the default."""
+    v = pd.to_numeric(col, errors="coerce").astype(float)
+    return v.where(np.isfinite(v), float(default))
 
 
-def _to_float(x, default=0.0):
-    try:
-        return float(x) if pd.notna(x) and str(x).strip() != "" else default
-    except Exception:
-        return default
+def _text_col(col: pd.Series) -> pd.Series:
+    return col.astype(object).where(col.notna(), "").astype(str).str.strip()
 
 
-def _degree_name(degree_id: int) -> str:
-    q = read_df("SELECT name FROM degrees WHERE id=?", (degree_id,))
-    return q["name"].iloc[0] if not q.empty else ""
+_CATALOG_EXPORT_COLS = ["code","name","degree","year","semester","credits","lectures","studios",
+                        "internal_pct","external_pct","threshold_internal_pct","threshold_external_pct"]
 
 
-def export_catalog_per_year_csv_bytes(degree_id: int, year: int) -> bytes:
+def _catalog_csv_bytes(q: pd.DataFrame) -> bytes:
+    # write rows straight from the object array; blanks for NULLs, as to_csv did
+    out = q.reindex(columns=_CATALOG_EXPORT_COLS, fill_value="")
+    buf = io.StringIO()
+    w = csv.writer(buf, lineterminator="\n")
+    w.writerow(_CATALOG_EXPORT_COLS)
+    w.writerows(out.to_numpy(dtype=object, na_value="").tolist())
+    return buf.getvalue().encode("utf-8")
+
+
+# exports are keyed on the DB data_version, so catalog, subject or degree edits from any page miss the cache
+@st.cache_data(max_entries=64, show_spinner=False)
+def _export_catalog_per_year(version: int, degree_id: int, year: int) -> bytes:
     abs1, abs2 = (year - 1) * 2 + 1, (year - 1) * 2 + 2
     q = read_df("""
         SELECT
           COALESCE(sc.code, s.code)      AS code,
           COALESCE(sc.name, s.name)      AS name,
-          ?                               AS degree,
+          (SELECT name FROM degrees WHERE id=?) AS degree,
           ((sc.semester + 1) / 2)         AS year,
           CASE WHEN sc.semester % 2 = 1 THEN 1 ELSE 2 END AS semester,
           sc.credits, sc.lectures, sc.studios,
@@ -173,24 +188,21 @@ def export_catalog_per_year_csv_bytes(degree_id: int, year: int) -> bytes:
                AND (LOWER(COALESCE(s.code,'')) = LOWER(COALESCE(sc.code,'')) OR LOWER(s.name)=LOWER(sc.name))
         WHERE sc.degree_id=? AND sc.batch_year IS NULL AND sc.semester IN (?,?)
         ORDER BY sc.semester, COALESCE(sc.code, s.code), COALESCE(sc.name, s.name)
-    """, (_degree_name(int(degree_id)), int(degree_id), abs1, abs2))
-    order = ["code","name","degree","year","semester","credits","lectures","studios",
-             "internal_pct","external_pct","threshold_internal_pct","threshold_external_pct"]
-    for col in order:
-        if col not in q.columns:
-            q[col] = ""
-    out = q[order].copy()
-    buf = io.StringIO()
-    out.to_csv(buf, index=False)
-    return buf.getvalue().encode("utf-8")
+    """, (int(degree_id), int(degree_id), abs1, abs2))
+    return _catalog_csv_bytes(q)
 
 
-def export_catalog_all_years_csv_bytes(degree_id: int) -> bytes:
+def export_catalog_per_year_csv_bytes(degree_id: int, year: int) -> bytes:
+    return _export_catalog_per_year(data_version(), int(degree_id), int(year))
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _export_catalog_all_years(version: int, degree_id: int) -> bytes:
     q = read_df("""
         SELECT
           COALESCE(sc.code, s.code)      AS code,
           COALESCE(sc.name, s.name)      AS name,
-          ?                               AS degree,
+          (SELECT name FROM degrees WHERE id=?) AS degree,
           ((sc.semester + 1) / 2)         AS year,
           CASE WHEN sc.semester % 2 = 1 THEN 1 ELSE 2 END AS semester,
           sc.credits, sc.lectures, sc.studios,
@@ -202,16 +214,123 @@ def export_catalog_all_years_csv_bytes(degree_id: int) -> bytes:
                AND (LOWER(COALESCE(s.code,'')) = LOWER(COALESCE(sc.code,'')) OR LOWER(s.name)=LOWER(sc.name))
         WHERE sc.degree_id=? AND sc.batch_year IS NULL
         ORDER BY sc.semester, COALESCE(sc.code, s.code), COALESCE(sc.name, s.name)
-    """, (_degree_name(int(degree_id)), int(degree_id)))
-    order = ["code","name","degree","year","semester","credits","lectures","studios",
-             "internal_pct","external_pct","threshold_internal_pct","threshold_external_pct"]
-    for col in order:
-        if col not in q.columns:
-            q[col] = ""
-    out = q[order].copy()
-    buf = io.StringIO()
-    out.to_csv(buf, index=False)
-    return buf.getvalue().encode("utf-8")
+    """, (int(degree_id), int(degree_id)))
+    return _catalog_csv_bytes(q)
+
+
+def export_catalog_all_years_csv_bytes(degree_id: int) -> bytes:
+    return _export_catalog_all_years(data_version(), int(degree_id))
+
+
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _sql_lower(v):
+    """LOWER() as SQLite applies it (ASCII letters only); NULL stays None."""
+    return None if v is None else str(v).translate(_ASCII_LOWER)
+
+
+def _apply_catalog_import(staged: list) -> int:
+    """
+    Write validated import rows in one transaction: resolve degrees from an
+    in-memory name map (creating missing ones), then resolve subjects and
+    catalog rows in CSV order against in-memory key maps (so later rows see
+    rows created earlier in the same file) and write the resolved tuples
+    with executemany (last CSV row wins).
+    Returns the number of degrees created.
+    """
+    with transaction() as conn:
+        # degrees: case-insensitive name -> first id; new names keep their first spelling
+        deg_by_lname = {}
+        for did, dname in conn.execute("SELECT id, name FROM degrees ORDER BY id"):
+            deg_by_lname.setdefault(str(dname).lower(), int(did))
+        new_degrees = 0
+        rows = []
+        for _pos, degree_name, *rest in staged:
+            did = deg_by_lname.get(degree_name.lower())
+            if did is None:
+                did = conn.execute(
+                    "INSERT INTO degrees(name, duration_years) VALUES(?, 5)", (degree_name,)
+                ).lastrowid
+                deg_by_lname[degree_name.lower()] = did
+                new_degrees += 1
+            rows.append((did, *rest))
+        deg_ids = sorted({r[0] for r in rows})
+        in_degrees = f"degree_id IN ({','.join('?' * len(deg_ids))})"
+
+        # subjects: by code, or by name when the row has no code; created ones count for later rows
+        subj_codes, subj_names = set(), set()
+        for did, sem, code, name in conn.execute(
+            f"SELECT degree_id, semester, code, name FROM subjects WHERE {in_degrees}", deg_ids
+        ):
+            subj_codes.add((did, sem, _sql_lower(code or "")))
+            subj_names.add((did, sem, _sql_lower(name)))
+        new_subjects = []
+        for did, sem, code, name, *_ in rows:
+            lcode, lname = _sql_lower(code or ""), _sql_lower(name)
+            found = (did, sem, lname) in subj_names if code is None else (did, sem, lcode) in subj_codes
+            if found:
+                continue
+            new_subjects.append((code, name, sem, did, (sem + 1) // 2))
+            subj_codes.add((did, sem, lcode))
+            subj_names.add((did, sem, lname))
+        conn.executemany(
+            "INSERT INTO subjects(code, name, semester, degree_id, year) VALUES(?,?,?,?,?)", new_subjects
+        )
+
+        # catalog rows: a row updates the oldest entry sharing its code or its name; entries
+        # created earlier in this import take part, so a file resolves the same on every run
+        targets = []          # catalog id, or None for an entry this import creates
+        by_code, by_name = {}, {}
+        for sc_id, did, sem, code, name in conn.execute(f"""
+            SELECT id, degree_id, semester, code, name FROM subject_criteria
+             WHERE batch_year IS NULL AND {in_degrees}
+             ORDER BY id
+        """, deg_ids):
+            by_code.setdefault((did, sem, _sql_lower(code or "")), len(targets))
+            if name is not None:
+                by_name.setdefault((did, sem, _sql_lower(name)), len(targets))
+            targets.append(sc_id)
+        first_row, last_row = {}, {}
+        for row in rows:
+            did, sem, code, name = row[:4]
+            ckey, nkey = (did, sem, _sql_lower(code or "")), (did, sem, _sql_lower(name))
+            hits = [t for t in (by_code.get(ckey), by_name.get(nkey)) if t is not None]
+            if hits:
+                t = min(hits)
+            else:
+                t = len(targets)
+                targets.append(None)
+                first_row[t] = row
+                by_code.setdefault(ckey, t)
+                by_name.setdefault(nkey, t)
+            last_row[t] = row
+
+        conn.executemany("""
+            UPDATE subject_criteria
+               SET credits=?, lectures=?, studios=?,
+                   internal_pct=?, external_pct=?,
+                   threshold_internal_pct=?, threshold_external_pct=?
+             WHERE id=?
+        """, [(*row[4:], targets[t]) for t, row in last_row.items() if targets[t] is not None])
+        # new entries keep the first row's code/name and take the last row's values
+        conn.executemany("""
+            INSERT INTO subject_criteria(
+                degree_id, batch_year, semester, code, name,
+                credits, lectures, studios,
+                internal_pct, external_pct,
+                threshold_internal_pct, threshold_external_pct
+            ) VALUES(?, NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(*first[:4], *last_row[t][4:]) for t, first in first_row.items()])
+    return new_degrees
+
+
+_CATALOG_IMPORT_COLS = frozenset({
+    "code","name","degree","year","semester","subject_type","credits","lectures","studios",
+    "internal_marks","external_exam_marks","external_jury_marks",
+    "internal_pct","external_pct","threshold_internal_pct","threshold_external_pct",
+    "direct_pct","indirect_pct"
+})
 
 
 def import_subject_criteria_csv_catalog(file_bytes: bytes) -> tuple[int, list]:
@@ -220,141 +339,85 @@ def import_subject_criteria_csv_catalog(file_bytes: bytes) -> tuple[int, list]:
     Rule: if external exam + jury marks == 0 → internal_pct=100, external_pct=0.
     Returns (rows_ok, rows_bad[ (row_idx, reason) ]).
     """
-    df = pd.read_csv(io.BytesIO(file_bytes))
-    cols = {c.strip().lower(): c for c in df.columns}
-    required = {
-        "code","name","degree","year","semester","subject_type","credits","lectures","studios",
-        "internal_marks","external_exam_marks","external_jury_marks",
-        "internal_pct","external_pct","threshold_internal_pct","threshold_external_pct",
-        "direct_pct","indirect_pct"
-    }
-    missing = required - set(cols.keys())
+    # text only and only the known columns; numbers are parsed column-wise below
+    df = pd.read_csv(io.BytesIO(file_bytes), dtype=str, engine="c",
+                     usecols=lambda c: str(c).strip().lower() in _CATALOG_IMPORT_COLS)
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+    missing = _CATALOG_IMPORT_COLS - set(df.columns)
     if missing:
         raise ValueError("Missing columns: " + ", ".join(sorted(missing)))
-
-    rows_ok, rows_bad = 0, []
-    for i, r in df.iterrows():
-        degree_name = str(r[cols["degree"]]).strip()
-        if not degree_name:
-            rows_bad.append((i, "Degree is empty"));  continue
-
-        year    = _to_int(r[cols["year"]])
-        sem_rel = _to_int(r[cols["semester"]])
-        if sem_rel not in (1,2) or year <= 0:
-            rows_bad.append((i, f"Invalid year/semester: year={year}, sem={sem_rel}"));  continue
-        abs_sem = (year - 1) * 2 + sem_rel
-
-        credits   = _to_int(r[cols["credits"]])
-        lectures  = _to_int(r[cols["lectures"]])
-        studios   = _to_int(r[cols["studios"]])
-        int_marks = _to_int(r[cols["internal_marks"]])
-        ext_exam  = _to_int(r[cols["external_exam_marks"]])
-        ext_jury  = _to_int(r[cols["external_jury_marks"]])
-
-        int_pct   = _to_float(r[cols["internal_pct"]])
-        ext_pct   = _to_float(r[cols["external_pct"]])
-        thr_int   = _to_float(r[cols["threshold_internal_pct"]])
-        thr_ext   = _to_float(r[cols["threshold_external_pct"]])
-
-        if (ext_exam + ext_jury) == 0:
-            int_pct, ext_pct = 100.0, 0.0
-
-        if abs((int_pct + ext_pct) - 100.0) > 0.01:
-            rows_bad.append((i, f"Internal%+External% != 100 ({int_pct}+{ext_pct})"));  continue
-
-        # upsert into catalog (batch NULL); create/resolve degree+subject by code/name
-        # degree creation utility:
-        qd = read_df("SELECT id FROM degrees WHERE LOWER(name)=LOWER(?) LIMIT 1", (degree_name,))
-        if qd.empty:
-            exec_sql("INSERT INTO degrees(name, duration_years) VALUES(?, ?)", (degree_name, 5))
-            qd = read_df("SELECT id FROM degrees WHERE LOWER(name)=LOWER(?) LIMIT 1", (degree_name,))
-        degree_id = int(qd["id"].iloc[0])
-
-        # ensure subject row exists (by code or name) for reference/cross-joins
-        code = (str(r[cols["code"]]).strip() or None)
-        if code and code.lower() == "nan":
-            code = None
-        name = str(r[cols["name"]]).strip()
-
-        # get/create subject id within this degree+abs_sem
-        if code:
-            qsid = read_df("""SELECT id FROM subjects
-                               WHERE degree_id=? AND LOWER(COALESCE(code,''))=LOWER(?) AND semester=? LIMIT 1""",
-                           (degree_id, code, abs_sem))
-        else:
-            qsid = read_df("""SELECT id FROM subjects
-                               WHERE degree_id=? AND LOWER(name)=LOWER(?) AND semester=? LIMIT 1""",
-                           (degree_id, name, abs_sem))
-        if qsid.empty:
-            exec_sql("INSERT INTO subjects(code, name, semester, degree_id, year) VALUES(?,?,?,?,?)",
-                     (code, name, abs_sem, degree_id, (abs_sem+1)//2))
-        # upsert subject_criteria row in catalog
-        row = read_df("""
-            SELECT id FROM subject_criteria
-             WHERE degree_id=? AND semester=? AND batch_year IS NULL
-               AND (LOWER(COALESCE(code,''))=LOWER(COALESCE(?,'')) OR LOWER(name)=LOWER(?))
-             LIMIT 1
-        """, (degree_id, abs_sem, code or "", name))
-        if row.empty:
-            exec_sql("""
-                INSERT INTO subject_criteria(
-                    degree_id, batch_year, semester, code, name,
-                    credits, lectures, studios,
-                    internal_pct, external_pct,
-                    threshold_internal_pct, threshold_external_pct
-                ) VALUES(?, NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (degree_id, abs_sem, code or None, name,
-                  credits or 0, lectures or 0, studios or 0,
-                  int_pct or 0.0, ext_pct or 0.0, thr_int or 0.0, thr_ext or 0.0))
-        else:
-            exec_sql("""
-                UPDATE subject_criteria
-                   SET credits=?, lectures=?, studios=?,
-                       internal_pct=?, external_pct=?,
-                       threshold_internal_pct=?, threshold_external_pct=?
-                 WHERE id=?
-            """, (credits or 0, lectures or 0, studios or 0,
-                  int_pct or 0.0, ext_pct or 0.0, thr_int or 0.0, thr_ext or 0.0,
-                  int(row["id"].iloc[0])))
-        rows_ok += 1
+    df = df.loc[:, ~df.columns.duplicated()]
+
+    degree_name = _text_col(df["degree"])
+    year     = _num_col(df["year"], 0).astype(int)
+    sem_rel  = _num_col(df["semester"], 0).astype(int)
+    credits  = _num_col(df["credits"], 0).astype(int)
+    lectures = _num_col(df["lectures"], 0).astype(int)
+    studios  = _num_col(df["studios"], 0).astype(int)
+    ext_exam = _num_col(df["external_exam_marks"], 0).astype(int)
+    ext_jury = _num_col(df["external_jury_marks"], 0).astype(int)
+    int_pct  = _num_col(df["internal_pct"], 0.0)
+    ext_pct  = _num_col(df["external_pct"], 0.0)
+    thr_int  = _num_col(df["threshold_internal_pct"], 0.0)
+    thr_ext  = _num_col(df["threshold_external_pct"], 0.0)
+
+    no_external = (ext_exam + ext_jury) == 0
+    int_pct = int_pct.mask(no_external, 100.0)
+    ext_pct = ext_pct.mask(no_external, 0.0)
+
+    # first failing check wins, as in the per-row loop
+    bad_degree = degree_name == ""
+    bad_sem = ~bad_degree & (~sem_rel.isin([1, 2]) | (year <= 0))
+    bad_sum = ~bad_degree & ~bad_sem & ((int_pct + ext_pct - 100.0).abs() > 0.01)
+
+    rows_bad = []
+    for i in df.index[bad_degree]:
+        rows_bad.append((i, "Degree is empty"))
+    for i in df.index[bad_sem]:
+        rows_bad.append((i, f"Invalid year/semester: year={int(year[i])}, sem={int(sem_rel[i])}"))
+    for i in df.index[bad_sum]:
+        rows_bad.append((i, f"Internal%+External% != 100 ({float(int_pct[i])}+{float(ext_pct[i])})"))
+    rows_bad.sort(key=lambda b: b[0])
+
+    ok = ~(bad_degree | bad_sem | bad_sum)
+    abs_sem = (year - 1) * 2 + sem_rel
+    code = _text_col(df["code"])
+    name = _text_col(df["name"])
+    staged = list(zip(
+        df.index[ok].astype(int).tolist(), degree_name[ok].tolist(), abs_sem[ok].tolist(),
+        [c or None for c in code[ok].tolist()], name[ok].tolist(),  # blank code -> NULL
+        credits[ok].tolist(), lectures[ok].tolist(), studios[ok].tolist(),
+        int_pct[ok].tolist(), ext_pct[ok].tolist(), thr_int[ok].tolist(), thr_ext[ok].tolist(),
+    ))
+
+    if staged:
+        _apply_catalog_import(staged)
+    rows_ok = len(staged)
 
     return rows_ok, rows_bad
 
 
 def find_catalog_duplicates(degree_id: int) -> pd.DataFrame:
-    dup = read_df("""
-        WITH base AS (
-          SELECT id, degree_id, semester, LOWER(COALESCE(code,'')) AS lcode,
-                 LOWER(name) AS lname, code, name, created
-          FROM (
-            SELECT sc.*, datetime(id, 'unixepoch') AS created
-            FROM subject_criteria sc
-          ) t
-          WHERE degree_id=? AND batch_year IS NULL
-        ),
-        c_group AS (
-          SELECT semester, lcode, COUNT(*) c
-          FROM base WHERE lcode <> ''
-          GROUP BY semester, lcode HAVING c > 1
-        ),
-        n_group AS (
-          SELECT semester, lname, COUNT(*) c
-          FROM base WHERE lcode = ''
-          GROUP BY semester, lname HAVING c > 1
-        )
-        SELECT b.*
-        FROM base b
-        JOIN (
-          SELECT semester, lcode AS keyv FROM c_group
-          UNION ALL
-          SELECT semester, lname AS keyv FROM n_group
-        ) g ON (
-          (b.lcode <> '' AND g.keyv = b.lcode AND g.semester=b.semester) OR
-          (b.lcode = ''  AND g.keyv = b.lname AND g.semester=b.semester)
-        )
-        ORDER BY b.semester, b.id
-    """, (degree_id,))
-    return dup
+    # one flat read; group by code where present, else by name, within a semester
+    base = read_df("""
+        SELECT id, semester, code, name,
+               LOWER(COALESCE(code,'')) AS lcode, LOWER(name) AS lname
+          FROM subject_criteria
+         WHERE degree_id=? AND batch_year IS NULL
+    """, (int(degree_id),))
+    has_code = base["lcode"] != ""
+    key_kind = pd.Series(np.where(has_code, "c", "n"), index=base.index)
+    key_val = base["lcode"].where(has_code, base["lname"])
+    dup = pd.DataFrame({"semester": base["semester"], "k": key_kind, "v": key_val}).duplicated(keep=False)
+    return base[dup].sort_values(["semester", "id"]).reset_index(drop=True)
+
+
+def _catalog_count(degree_id: int) -> int:
+    q = read_df("SELECT COUNT(*) AS c FROM subject_criteria WHERE degree_id=? AND batch_year IS NULL", (int(degree_id),))
+    return int(q["c"].iloc[0])
+
+
+_DELETE_CHUNK = 500
 
 
 def dedupe_catalog_keep_latest(degree_id: int) -> tuple[int,int]:
@@ -362,27 +425,21 @@ def dedupe_catalog_keep_latest(degree_id: int) -> tuple[int,int]:
     if dup.empty:
         return (0, 0)
 
-    def key_row(r):
-        if str(r["code"] or "").strip() != "":
-            return (int(r["semester"]), "c", str(r["code"]).strip().lower())
-        else:
-            return (int(r["semester"]), "n", str(r["name"]).strip().lower())
+    # key by code when present, else by name; keep the highest id per group
+    lcode = dup["code"].fillna("").astype(str).str.strip().str.lower()
+    lname = dup["name"].fillna("").astype(str).str.strip().str.lower()
+    dup["key_kind"] = np.where(lcode != "", "c", "n")
+    dup["key_val"] = np.where(lcode != "", lcode, lname)
 
-    groups = {}
-    for _, r in dup.iterrows():
-        k = key_row(r)
-        groups.setdefault(k, []).append(int(r["id"]))
-
-    keep, delete = [], []
-    for _, ids in groups.items():
-        ids_sorted = sorted(ids)
-        keep_id = ids_sorted[-1]
-        keep.append(keep_id)
-        delete_ids = ids_sorted[:-1]
-        delete.extend(delete_ids)
+    keep = dup.groupby(["semester", "key_kind", "key_val"])["id"].max()
+    delete = dup.loc[~dup["id"].isin(keep), "id"].astype(int).tolist()
 
     if delete:
-        exec_many("DELETE FROM subject_criteria WHERE id=?", [(i,) for i in delete])
+        # one statement per chunk; stays under SQLite's bound-parameter limit
+        with transaction() as conn:
+            for k in range(0, len(delete), _DELETE_CHUNK):
+                ids = delete[k:k + _DELETE_CHUNK]
+                conn.execute(f"DELETE FROM subject_criteria WHERE id IN ({','.join('?' * len(ids))})", ids)
 
     return (len(keep), len(delete))
 
@@ -409,8 +466,20 @@ def render_import_export_panel(degree_id: int):
                 st.error(f"Import failed: {e}")
 
     with st.expander("🔎 Find & Fix Duplicates (catalog only)", expanded=False):
-        if st.button("Scan duplicates", key="sc_scan_dups"):
-            dups = find_catalog_duplicates(int(degree_id))
+        # last scan is kept per degree until the catalog row count changes
+        scanned = st.session_state.get("_sc_dups")
+        if scanned and scanned[0][0] == int(degree_id):
+            if scanned[0] != (int(degree_id), _catalog_count(int(degree_id))):
+                st.session_state.pop("_sc_dups", None)
+                scanned = None
+        else:
+            scanned = None
+        if st.button("Scan duplicates", key="sc_scan_dups") and scanned is None:
+            key = (int(degree_id), _catalog_count(int(degree_id)))
+            scanned = (key, find_catalog_duplicates(int(degree_id)))
+            st.session_state["_sc_dups"] = scanned
+        if scanned is not None:
+            dups = scanned[1]
             if dups.empty:
                 st.success("No duplicates found.")
             else:
@@ -418,12 +487,13 @@ def render_import_export_panel(degree_id: int):
                 st.dataframe(dups[["id","semester","code","name"]], use_container_width=True)
                 if st.button("De-duplicate (keep latest)", type="primary", key="sc_dedupe_go"):
                     kept, deleted = dedupe_catalog_keep_latest(int(degree_id))
+                    st.session_state.pop("_sc_dups", None)
                     st.success(f"Done. Kept {kept}, deleted {deleted}.")
                     st.rerun()
 
     with st.expander("📤 Export Catalog", expanded=False):
         # duration chooses the max year for single-year export control
-        dur = int(read_df("SELECT duration_years FROM degrees WHERE id=?", (int(degree_id),))["duration_years"].iloc[0])
+        dur = _degree_duration(data_version(), int(degree_id))
         y = st.number_input("Export single Year", min_value=1, max_value=dur, value=1, step=1, key="sc_exp_year")
         c1, c2 = st.columns(2)
         with c1:
@@ -450,6 +520,12 @@ def render_import_export_panel(degree_id: int):
                 )
 
 
+def _scope_labels(scope_df: pd.DataFrame) -> List[str]:
+    """'code · name' picker labels, positionally aligned with scope_df rows."""
+    return (scope_df["code"].fillna("").astype(str).str.strip() + " · "
+            + scope_df["name"].astype(str)).tolist()
+
+
 # ------------------------ UI (trimmed after Attainment) ------------------------
 
 def render(user: dict):
@@ -462,16 +538,18 @@ def render(user: dict):
     st.header("Subject Criteria")
 
     # -------- Scope pickers --------
-    deg_df = _degrees_df()
+    deg_df = _degrees_df(data_version())
     if deg_df.empty:
         st.info("Please create a Degree/Program first (Degrees page).")
         render_footer(); return
+    deg_by_name = {}
+    for r in deg_df.to_dict("records"):
+        deg_by_name.setdefault(r["name"], (int(r["id"]), int(r["duration_years"])))  # first match, as before
 
     c1, c2, c3 = st.columns([2, 1, 1])
     with c1:
         deg_pick = st.selectbox("Degree / Program", deg_df["name"].tolist(), index=0, key="sc_deg")
-        degree_id = int(deg_df[deg_df["name"] == deg_pick]["id"].iloc[0])
-        duration = int(deg_df[deg_df["name"] == deg_pick]["duration_years"].iloc[0])
+        degree_id, duration = deg_by_name[deg_pick]
 
     with c2:
         year = st.number_input("Year", min_value=1, max_value=duration, value=1, step=1, key="sc_year")
@@ -500,9 +578,11 @@ def render(user: dict):
         use_container_width=True,
     )
 
+    scope_labels = _scope_labels(scope_df)  # built from this rerun's rows, so index i is always scope_df.iloc[i]
+
     # ---------------- Add/Edit (master) ----------------
     with st.expander("➕ Add / Edit a subject", expanded=False):
-        names = ["— New —"] + [f"{(r['code'] or '').strip()} · {r['name']}" for _, r in scope_df.iterrows()]
+        names = ["— New —"] + scope_labels
         pick = st.selectbox("Select", names, index=0, key="sc_edit_pick")
         existing = None
         if pick != "— New —":
@@ -566,7 +646,7 @@ def render(user: dict):
     if scope_df.empty:
         st.info("No subjects in this scope yet.")
     else:
-        subj_label = [f"{(r['code'] or '').strip()} · {r['name']}" for _, r in scope_df.iterrows()]
+        subj_label = scope_labels
         idx = st.selectbox("Choose a subject", list(range(len(subj_label))), format_func=lambda i: subj_label[i], key="sc_att_pick")
         subj_id = int(scope_df.iloc[idx]["id"])
         a = _attainment_row(subj_id)
@@ -1,15 +1,18 @@
 # pages/users_passwords.py
 from __future__ import annotations
 import re
+from functools import lru_cache
 import pandas as pd
+import pyarrow as pa
 import streamlit as st
 
-from core.db import read_df, get_conn
+from core.db import get_conn, read_conn, data_version
 from core.theme import render_theme_css
 from core.branding import render_header, render_footer
 from core.security import (
     create_user,             # create/update (plaintext auth), supports overwrite_password
     sanitize_username,       # normalize usernames
+    ensure_users_for_all_faculty,  # backfill accounts for faculty without one
 )
 
 # ---------------- Permissions ----------------
@@ -17,8 +20,13 @@ def can_manage(role: str) -> bool:
     return (role or "").lower() in ("superadmin", "principal", "director")
 
 # ---------------- Schema guard ----------------
+_SCHEMA_READY = False  # DDL below runs once per process
+
 def _ensure_users():
     # Match security.py users table (add is_active and status default)
+    global _SCHEMA_READY
+    if _SCHEMA_READY:
+        return
     with get_conn() as conn:
         cur = conn.cursor()
         cur.execute("""
@@ -36,29 +44,85 @@ def _ensure_users():
             cur.execute("CREATE INDEX IF NOT EXISTS idx_users_faculty ON users(faculty_id)")
         except Exception:
             pass
+        try:
+            # case-insensitive username lookups (`username=? COLLATE NOCASE`) seek this index
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users(username COLLATE NOCASE)")
+        except Exception:
+            pass
         conn.commit()
+    _SCHEMA_READY = True
+
+# ---------------- Cached reads (keyed on the DB data_version) ----------------
+_ALL_COVERED_DF = pd.DataFrame({"info": ["All faculty have users."]})  # shared; st.dataframe doesn't mutate it
+USERS_PAGE = 50
+
+def _fetch_table(sql: str, params: tuple = ()) -> pa.Table:
+    """Cursor rows -> Arrow table column by column, without a pandas DataFrame in between."""
+    with read_conn() as conn:
+        cur = conn.execute(sql, params)
+        cols = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+    data = {}
+    for i, col in enumerate(cols):
+        vals = [r[i] for r in rows]
+        try:
+            data[col] = pa.array(vals)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):  # mixed types (e.g. COALESCE(int,'')) -> text
+            data[col] = pa.array([None if v is None else str(v) for v in vals])
+    return pa.table(data)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _count_users(version: int) -> int:
+    with read_conn() as conn:
+        return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _load_users(version: int, page: int) -> pa.Table:
+    # username is UNIQUE, so its automatic index already serves ORDER BY ... LIMIT
+    return _fetch_table("""
+        SELECT id, username, COALESCE(role,'') AS role,
+               COALESCE(status,'active') AS status,
+               COALESCE(faculty_id,'') AS faculty_id,
+               COALESCE(is_active,1) AS is_active
+        FROM users ORDER BY username LIMIT ? OFFSET ?
+    """, (USERS_PAGE, (page - 1) * USERS_PAGE))
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _load_missing_faculty(version: int) -> pa.Table:
+    return _fetch_table("""
+        SELECT f.id, f.name, f.type, f.email
+        FROM faculty f
+        LEFT JOIN users u ON u.faculty_id = f.id
+        WHERE u.id IS NULL
+        ORDER BY f.name
+    """)
 
 # ------------- Suggest credentials (local) -------------
 # Mirrors the logic used by core.security: strip titles, make base, add 4 digits, password base@suffix
 _TITLES = re.compile(r"^(dr\.?|prof\.?|ar\.?|er\.?|architect|engineer|mr\.?|mrs\.?|ms\.?)\s+", re.I)
+_SPLIT_WS = re.compile(r"\s+")
 
+@lru_cache(maxsize=2048)
 def _strip_title(name: str) -> str:
-    return re.sub(_TITLES, "", str(name or "").strip()).strip()
+    s = name.strip() if isinstance(name, str) else str(name or "").strip()
+    return _TITLES.sub("", s).strip()
 
+@lru_cache(maxsize=2048)
 def _split_name(full: str) -> tuple[str, str]:
-    s = _strip_title(full)
-    parts = re.split(r"\s+", s)
+    parts = _SPLIT_WS.split(_strip_title(full))
     if not parts:
         return "", ""
     if len(parts) == 1:
         return parts[0].lower(), ""
     return parts[0].lower(), parts[-1].lower()
 
+@lru_cache(maxsize=2048)
 def _base_username(first: str, last: str) -> str:
     if first and last:
         return (first[:5] + last[:1]).lower()
     return (first or last)[:6].lower()
 
+@lru_cache(maxsize=2048)  # pure: same name -> same example pair
 def suggest_credentials(full_name: str) -> tuple[str, str]:
     first, last = _split_name(full_name)
     base = _base_username(first, last) or "user"
@@ -66,86 +130,39 @@ def suggest_credentials(full_name: str) -> tuple[str, str]:
     sample_suffix = "1234"
     return sanitize_username(base + sample_suffix), f"{base}@{sample_suffix}"
 
-# ---------------- Page ----------------
-def render(user: dict):
-    _ensure_users()
-    render_theme_css()
-    render_header()
-    st.header("Users & Passwords")
-
-    role = (user.get("role") or "").lower()
-    editable = can_manage(role)
-    if not editable:
-        st.info("Only Superadmin / Principal / Director can manage users.")
-
-    # List users
-    df = read_df("""
-        SELECT id, username, COALESCE(role,'') AS role,
-               COALESCE(status,'active') AS status,
-               COALESCE(faculty_id,'') AS faculty_id,
-               COALESCE(is_active,1) AS is_active
-        FROM users ORDER BY username
-    """)
-    st.subheader("All users")
-    st.dataframe(
-        df if not df.empty else pd.DataFrame(columns=["id","username","role","status","faculty_id","is_active"]),
-        use_container_width=True
-    )
-
-    # Backfill accounts for any faculty who don't have a user yet
-    from core.security import ensure_users_for_all_faculty
-    st.divider()
-    st.subheader("Provision missing faculty accounts")
-    if st.button("Generate for all missing faculty", disabled=not editable):
-        created = ensure_users_for_all_faculty(default_role="subject_faculty")
-        if created:
-            st.success(f"Created {len(created)} account(s).")
-            with st.expander("New credentials (one-time)"):
-                st.dataframe(pd.DataFrame(created), use_container_width=True)
-        else:
-            st.info("No missing accounts found. All faculty already have users.")
-
-    with st.expander("Faculty without users"):
-        missing = read_df("""
-            SELECT f.id, f.name, f.type, f.email
-            FROM faculty f
-            LEFT JOIN users u ON u.faculty_id = f.id
-            WHERE u.id IS NULL
-            ORDER BY f.name
-        """)
-        st.dataframe(
-            missing if not missing.empty else pd.DataFrame({"info":["All faculty have users."]}),
-            use_container_width=True
-        )
+# ---------------- Forms (fragments: a submit reruns only its own section) ----------------
+def _parse_fid(s: str) -> int | None:
+    s = s.strip()
+    return int(s) if s.isdigit() else None
 
-    st.divider()
+@st.fragment
+def _user_edit_form():
     st.subheader("Create / Update User")
     with st.form("user_edit", clear_on_submit=True):
-        username_in = st.text_input("Username").strip().lower()
+        username_in = st.text_input("Username")
         password_in = st.text_input("Password", type="password")
         role_pick   = st.selectbox("Role", [
             "superadmin","principal","director","branch_head",
             "class_in_charge","subject_in_charge","subject_faculty"
         ])
         status_in   = st.selectbox("Status", ["active","new","pending","disabled"], index=0)
-        faculty_id_in = st.text_input("Faculty ID (optional)").strip()
+        faculty_id_in = st.text_input("Faculty ID (optional)")
         overwrite_pwd = st.checkbox("Overwrite existing password if user exists", value=False)
-        ok_save = st.form_submit_button("Save", disabled=not editable)
+        ok_save = st.form_submit_button("Save")
 
-    if ok_save and editable:
-        if not username_in or not password_in:
+    if ok_save:
+        uname = sanitize_username(username_in)  # sole normalizer: strip, lowercase, drop stray chars
+        if not uname or not password_in:
             st.warning("Username and password are required.")
         else:
             try:
-                uname = sanitize_username(username_in)
-                fid = int(faculty_id_in) if faculty_id_in.isdigit() else None
                 # Use create_user with overwrite toggled as needed
                 create_user(
                     username=uname,
                     password=password_in,
                     role=role_pick,
                     status=status_in,
-                    faculty_id=fid,
+                    faculty_id=_parse_fid(faculty_id_in),
                     overwrite_password=overwrite_pwd
                 )
                 st.success(f"User saved: {uname}")
@@ -153,41 +170,34 @@ def render(user: dict):
             except Exception as e:
                 st.error(f"Save failed: {e}")
 
+@st.fragment
+def _reset_password_form():
     st.subheader("Reset Password")
     with st.form("user_reset", clear_on_submit=True):
-        uname_reset = st.text_input("Username to reset").strip().lower()
+        uname_reset = st.text_input("Username to reset")
         newpw_reset = st.text_input("New password", type="password")
-        ok_reset = st.form_submit_button("Reset", disabled=not editable)
+        ok_reset = st.form_submit_button("Reset")
 
-    if ok_reset and editable:
-        if not uname_reset or not newpw_reset:
+    if ok_reset:
+        uname = sanitize_username(uname_reset)
+        if not uname or not newpw_reset:
             st.warning("Username and new password are required.")
         else:
             try:
-                uname = sanitize_username(uname_reset)
-                # Reset = update with overwrite_password=True (role/status/faculty_id unchanged if we pass None)
-                # Fetch current to preserve role/status/faculty_id
-                cur = read_df("SELECT role, status, faculty_id FROM users WHERE LOWER(username)=LOWER(?) LIMIT 1", (uname,))
-                if cur.empty:
+                # Reset touches only the password; role/status/faculty_id stay as they are
+                with get_conn() as conn:
+                    n = conn.execute(
+                        "UPDATE users SET password=? WHERE username=? COLLATE NOCASE", (newpw_reset, uname)
+                    ).rowcount
+                if n == 0:
                     st.error("User not found.")
                 else:
-                    role0   = str(cur.iloc[0]["role"] or "subject_faculty")
-                    status0 = str(cur.iloc[0]["status"] or "active")
-                    fid0    = int(cur.iloc[0]["faculty_id"]) if str(cur.iloc[0]["faculty_id"]).strip().isdigit() else None
-                    create_user(
-                        username=uname,
-                        password=newpw_reset,
-                        role=role0,
-                        status=status0,
-                        faculty_id=fid0,
-                        overwrite_password=True
-                    )
                     st.success("Password reset.")
-                    st.rerun()
             except Exception as e:
                 st.error(f"Reset failed: {e}")
 
-    st.divider()
+@st.fragment
+def _suggest_block():
     st.subheader("Suggest Credentials From Name")
     nm = st.text_input("Full name (e.g., Ar. Parikshit Waghdhare)")
     if st.button("Suggest"):
@@ -198,4 +208,59 @@ def render(user: dict):
         else:
             st.warning("Enter a name first.")
 
+# ---------------- Page ----------------
+def render(user: dict):
+    _ensure_users()
+    render_theme_css()
+    render_header()
+    st.header("Users & Passwords")
+
+    role = (user.get("role") or "").lower()
+    editable = can_manage(role)
+
+    # List users
+    version = data_version()
+    total = _count_users(version)
+    pages = max(1, -(-total // USERS_PAGE))
+    st.subheader("All users")
+    page = int(st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key="up_users_page"))
+    st.caption(f"{total} user(s) • page {page} of {pages}")
+    df = _load_users(version, page)
+    st.dataframe(df, use_container_width=True)  # empty result still carries the column headers
+
+    # Read-only viewers get the list only; the admin widgets below are never built for them
+    if not editable:
+        st.info("Only Superadmin / Principal / Director can manage users.")
+        render_footer()
+        return
+
+    # Backfill accounts for any faculty who don't have a user yet
+    st.divider()
+    st.subheader("Provision missing faculty accounts")
+    if st.button("Generate for all missing faculty"):
+        created = ensure_users_for_all_faculty(default_role="subject_faculty")
+        if created:
+            st.success(f"Created {len(created)} account(s).")
+            with st.expander("New credentials (one-time)"):
+                st.dataframe(pd.DataFrame(created), use_container_width=True)
+        else:
+            st.info("No missing accounts found. All faculty already have users.")
+
+    with st.expander("Faculty without users"):
+        # expander bodies run even when collapsed; only query once the list is asked for
+        if st.session_state.get("up_show_missing") or st.button("Load missing faculty list", key="up_load_missing"):
+            st.session_state["up_show_missing"] = True
+            missing = _load_missing_faculty(version)
+            st.dataframe(
+                missing if missing.num_rows else _ALL_COVERED_DF,
+                use_container_width=True
+            )
+
+    st.divider()
+    _user_edit_form()
+    _reset_password_form()
+
+    st.divider()
+    _suggest_block()
+
     render_footer()